@@ -0,0 +1 @@
+pytest_plugins = ['users.pytest_plugin']
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'users.middleware.ConcurrencyLimitMiddleware',
+    'users.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,6 +58,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'users.middleware.ProfilingMiddleware',
+    'users.middleware.QueryBudgetMiddleware',
 ]
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -101,6 +105,47 @@ DATABASES = {
 db_from_env = dj_database_url.config(conn_max_age=600)
 DATABASES['default'].update(db_from_env)
 
+# Cache shared between workers (throttling state), local memory when no Redis is configured
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Requests in flight across all workers before ConcurrencyLimitMiddleware answers 503, 0 disables.
+# Counted in the default cache, so the limit is global only with Redis (per process with local memory)
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('MAX_CONCURRENT_REQUESTS', 0))
+CONCURRENCY_RETRY_AFTER = int(os.environ.get('CONCURRENCY_RETRY_AFTER', 1))
+# seconds a worker's count outlives its last change, no request outlives the gunicorn timeout
+# so this bounds how long the count of a killed worker holds slots
+CONCURRENCY_COUNTER_TTL = int(os.environ.get('GUNICORN_TIMEOUT', 30)) + 5
+
+# Response compression, zstd/br are used only when zstandard/brotli are installed
+COMPRESS_ENCODINGS = ['zstd', 'br', 'gzip']
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_STREAMING = False
+
+# Upper bound of sub-requests in one POST /api/v1/batch/
+BATCH_MAX_OPERATIONS = 100
+
+# Request profiling for admins (X-Profile header) and PROFILING_PATHS regexes, off unless enabled
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '') == '1'
+PROFILING_PATHS = []
+PROFILING_SAMPLE_INTERVAL = 0.001
+
+# Per-view query budgets (users.query_budget): 'log' warns, 'raise' fails the request (tests), 'off'
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'log')
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -157,7 +202,24 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
-    'PAGE_SIZE': 10
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'users.renderers.NormalizedJSONRenderer',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'users.throttling.WriteRateThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.environ.get('THROTTLE_LOGIN_RATE', '10/min'),
+        'registration': os.environ.get('THROTTLE_REGISTRATION_RATE', '5/min'),
+        'user_list': os.environ.get('THROTTLE_USER_LIST_RATE', '30/min'),
+        'write': os.environ.get('THROTTLE_WRITE_RATE', '120/min'),
+    },
+    'PAGE_SIZE': 10,
+    # proxies in front of the app (Heroku router), throttles key on the client address they append
+    # to X-Forwarded-For instead of the whole client-controlled header
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 1)),
 }
 
 AUTH_USER_MODEL = 'users.User'
@@ -0,0 +1,14 @@
+"""
+Settings of the test suite (pytest.ini, or manage.py test --settings=easy_study_backend.test_settings).
+Variables already set in the environment win, so CI can point DATABASE_URL at Postgres.
+"""
+import os
+
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ.setdefault('DATABASE_URL', 'sqlite://:memory:')
+os.environ.setdefault('QUERY_BUDGET_MODE', 'raise')
+
+from easy_study_backend.settings import *  # noqa: E402,F401,F403
+
+# hashing with the production hasher dominates the run time of tests that create users
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -0,0 +1,86 @@
+"""
+Warm-up of freshly started processes, called from gunicorn.conf.py hooks.
+
+warm_up_application() only imports and builds in-memory structures, so it is safe
+to run in the gunicorn master before workers are forked. warm_up_worker() opens
+connections and must run in each worker after the fork.
+"""
+import inspect
+import threading
+
+from django.core.cache import caches
+from django.db import connections
+from django.urls import get_resolver, URLPattern, URLResolver
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import BaseSerializer
+from rest_framework.views import APIView
+
+
+def iter_views(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, 'cls', None) or getattr(pattern.callback, 'view_class', None)
+            if view_class is not None and issubclass(view_class, APIView):
+                yield view_class
+
+
+def warm_up_application():
+    """
+    Imports every URL conf and view, resolves DRF and simplejwt lazy settings and builds serializer fields
+    """
+    resolver = get_resolver()
+    resolver.reverse_dict  # populates the resolver, importing every included URL conf
+
+    for view_class in set(iter_views(resolver.url_patterns)):
+        view = view_class()
+        view.get_renderers()
+        view.get_parsers()
+        view.get_authenticators()
+        view.get_permissions()
+        view.get_throttles()
+
+    from users import serializers
+    for _, serializer_class in inspect.getmembers(serializers, inspect.isclass):
+        if issubclass(serializer_class, BaseSerializer) and hasattr(serializer_class, 'Meta'):
+            serializer_class().fields
+
+    JSONRenderer().render({'warm': True})
+
+
+def warm_up_connections():
+    """
+    Verifies the database is reachable and connects to the cache backend, for the calling thread only
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+    caches['default'].get('warmup')
+
+
+def warm_up_worker(pool=None, threads=1, timeout=10):
+    """
+    Django database and cache connections are thread-local, so they are opened on the threads
+    that serve requests: the calling thread without a pool (sync workers), otherwise every thread
+    of the gthread pool. The barrier keeps each task busy until all of them run, which makes the
+    pool start all its threads instead of reusing the first one.
+    """
+    if pool is None:
+        warm_up_connections()
+        return
+
+    barrier = threading.Barrier(threads, timeout=timeout)
+
+    def warm_up_thread():
+        barrier.wait()
+        warm_up_connections()
+
+    for future in [pool.submit(warm_up_thread) for _ in range(threads)]:
+        future.result()
+
+
+def close_connections():
+    """
+    Connections must not be shared with forked workers
+    """
+    connections.close_all()
@@ -0,0 +1,35 @@
+import os
+
+wsgi_app = 'easy_study_backend.wsgi:application'
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
+
+# Django, DRF and the URL confs are imported once in the master and shared copy-on-write
+preload_app = True
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+
+# recycle workers now and then so slow memory growth cannot accumulate
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+
+def when_ready(server):
+    from easy_study_backend.warmup import warm_up_application, close_connections
+    warm_up_application()
+    close_connections()
+    server.log.info('Application warmed up')
+
+
+def post_worker_init(worker):
+    from easy_study_backend.warmup import warm_up_worker
+    try:
+        # gthread workers serve requests on their pool threads, sync workers on the main thread
+        warm_up_worker(getattr(worker, 'tpool', None), worker.cfg.threads)
+    except Exception:
+        # the worker can still serve, connections are retried on the first request
+        worker.log.exception('Worker %s warm-up failed', worker.pid)
+    else:
+        worker.log.info('Worker %s warmed up', worker.pid)
@@ -1,7 +1,17 @@
 from django.contrib import admin
-from users.models import User, StudyGroup, Lesson, Mark
+from users.models import User, StudyGroup, Lesson, Mark, ArchivedMark, ArchivedAttendance
+
+
+class ArchivableAdmin(admin.ModelAdmin):
+    list_filter = ['archived']
+
+    def get_queryset(self, request):
+        return self.model.all_objects.all()
+
 
 admin.site.register(User)
-admin.site.register(StudyGroup)
-admin.site.register(Lesson)
+admin.site.register(StudyGroup, ArchivableAdmin)
+admin.site.register(Lesson, ArchivableAdmin)
 admin.site.register(Mark)
+admin.site.register(ArchivedMark)
+admin.site.register(ArchivedAttendance)
@@ -0,0 +1,106 @@
+import io
+import json
+import re
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.urls import Resolver404, resolve
+from rest_framework.views import APIView
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# {{0.id}} is replaced by the "id" of the body of the first response
+REFERENCE = re.compile(r'\{\{(\d+)((?:\.\w+)*)\}\}')
+
+
+class BatchError(Exception):
+    pass
+
+
+def lookup_reference(responses, match):
+    index = int(match.group(1))
+    if index >= len(responses):
+        raise BatchError('Reference to operation %d which has not been executed' % index)
+    value = responses[index]['body']
+    for key in filter(None, match.group(2).split('.')):
+        try:
+            value = value[int(key)] if isinstance(value, list) else value[key]
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise BatchError('Reference %s cannot be resolved' % match.group(0))
+    return value
+
+
+def substitute(value, responses):
+    """
+    Replaces {{n.key}} references to earlier responses, a string that is exactly
+    one reference takes the referenced value with its type (e.g. an integer id)
+    """
+    if isinstance(value, str):
+        match = REFERENCE.fullmatch(value)
+        if match:
+            return lookup_reference(responses, match)
+        return REFERENCE.sub(lambda m: str(lookup_reference(responses, m)), value)
+    if isinstance(value, list):
+        return [substitute(item, responses) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute(item, responses) for key, item in value.items()}
+    return value
+
+
+def build_request(request, method, path, body, membership_cache):
+    """
+    Sub-request sharing headers, the authenticated user and the membership cache of the batch request
+    """
+    url = urlsplit(path)
+    content = json.dumps(body).encode() if body is not None else b''
+    environ = {key: value for key, value in request.META.items() if not key.startswith('wsgi.')}
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'wsgi.input': io.BytesIO(content),
+        'wsgi.url_scheme': request.scheme,
+    })
+    environ.pop('HTTP_ACCEPT_ENCODING', None)
+    sub_request = WSGIRequest(environ)
+    # DRF uses the forced user instead of authenticating the JWT again
+    sub_request._force_auth_user = request.user
+    sub_request.membership_cache = membership_cache
+    # WriteRateThrottle already charged the batch request for every unsafe operation
+    sub_request.batched = True
+    return sub_request
+
+
+def dispatch(request, operation, responses, membership_cache, excluded_view):
+    if not isinstance(operation, dict):
+        raise BatchError('Operation must be an object with method, path and body')
+    method = str(operation.get('method', 'GET')).upper()
+    if method not in BATCH_METHODS:
+        raise BatchError('Unsupported method ' + method)
+    path = substitute(operation.get('path'), responses)
+    if not isinstance(path, str) or not path.startswith('/'):
+        raise BatchError('Operation path must be an absolute path')
+    body = substitute(operation.get('body'), responses)
+
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return {'status': 404, 'body': None}
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None or not issubclass(view_class, APIView):
+        # plain Django views (admin, api-auth) rely on the middleware that sub-requests skip
+        raise BatchError('Only API endpoints can be batched')
+    if view_class is excluded_view:
+        raise BatchError('Batch requests cannot be nested')
+
+    sub_request = build_request(request, method, path, body, membership_cache)
+    response = match.func(sub_request, *match.args, **match.kwargs)
+    if hasattr(response, 'data'):
+        result = response.data
+    elif response.streaming:
+        result = b''.join(response.streaming_content).decode(response.charset)
+    else:
+        result = response.content.decode(response.charset)
+    return {'status': response.status_code, 'body': result}
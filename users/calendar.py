@@ -0,0 +1,89 @@
+from datetime import datetime, time, timedelta, timezone
+
+from django.utils import timezone as django_timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+LESSON_DURATION = timedelta(minutes=90)
+
+
+def parse_bound(value):
+    """
+    Parses ?from= / ?to= value, accepts both datetimes and plain dates (midnight)
+    """
+    if value is None or value == '':
+        return None
+    result = parse_datetime(value)
+    if result is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError('Invalid date: ' + value)
+        result = datetime.combine(day, time.min)
+    if django_timezone.is_naive(result):
+        result = django_timezone.make_aware(result)
+    return result
+
+
+def parse_date_range(params):
+    date_from = parse_bound(params.get('from'))
+    date_to = parse_bound(params.get('to'))
+    if date_from is not None and date_to is not None and date_from > date_to:
+        raise ValueError('"from" must not be later than "to"')
+    return date_from, date_to
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _format(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _fold(line):
+    """
+    Folds content lines longer than 75 octets as required by RFC 5545
+    """
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = list()
+    while encoded:
+        limit = 75 if not parts else 74
+        chunk = encoded[:limit]
+        # do not split a multibyte character
+        while True:
+            try:
+                parts.append(chunk.decode('utf-8'))
+                break
+            except UnicodeDecodeError:
+                chunk = chunk[:-1]
+        encoded = encoded[len(chunk):]
+    return '\r\n '.join(parts)
+
+
+def lessons_to_ical(lessons, host='easy-study'):
+    """
+    Renders lessons (with selected group) as an iCalendar document
+    """
+    stamp = _format(django_timezone.now())
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Easy Study//Schedule//EN',
+        'CALSCALE:GREGORIAN',
+    ]
+    for lesson in lessons:
+        if lesson.date is None:
+            continue
+        lines += [
+            'BEGIN:VEVENT',
+            'UID:lesson-%d@%s' % (lesson.id, host),
+            'DTSTAMP:' + stamp,
+            'DTSTART:' + _format(lesson.date),
+            'DTEND:' + _format(lesson.date + LESSON_DURATION),
+            'SUMMARY:' + _escape(lesson.title),
+            'DESCRIPTION:' + _escape('%s, %s' % (lesson.group.subject_title, lesson.group.group_title)),
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
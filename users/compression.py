@@ -0,0 +1,132 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def compress(self, data):
+        compressor = self.compressobj()
+        return compressor.compress(data) + compressor.finish()
+
+    def compressobj(self):
+        return StreamCompressor(zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS),
+                                lambda c: c.flush(zlib.Z_SYNC_FLUSH), lambda c: c.flush())
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality=4):
+        self.quality = quality
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def compressobj(self):
+        return StreamCompressor(brotli.Compressor(quality=self.quality), lambda c: c.flush(), lambda c: c.finish(),
+                                method='process')
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level=3):
+        self.level = level
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def compressobj(self):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        return StreamCompressor(compressor, lambda c: c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                                lambda c: c.flush())
+
+
+class StreamCompressor:
+    """
+    Uniform incremental interface: every chunk is flushed so clients can decode it immediately
+    """
+    def __init__(self, compressor, flush, finish, method='compress'):
+        self.compressor = compressor
+        self._compress = getattr(compressor, method)
+        self._flush = flush
+        self._finish = finish
+
+    def compress(self, data):
+        return self._compress(data)
+
+    def flush(self):
+        return self._flush(self.compressor)
+
+    def finish(self):
+        return self._finish(self.compressor)
+
+    def stream(self, chunks):
+        for chunk in chunks:
+            data = self.compress(chunk) + self.flush()
+            if data:
+                yield data
+        yield self.finish()
+
+
+ENCODERS = {
+    'gzip': GzipEncoder,
+    'br': BrotliEncoder,
+    'zstd': ZstdEncoder,
+}
+
+
+def available_encodings(preferred):
+    """
+    Filters the preferred encodings down to the ones whose libraries are installed
+    """
+    installed = {'gzip': True, 'br': brotli is not None, 'zstd': zstandard is not None}
+    return [name for name in preferred if installed.get(name)]
+
+
+def parse_accept_encoding(header):
+    """
+    Returns {encoding: q} for the Accept-Encoding header
+    """
+    result = dict()
+    for item in header.split(','):
+        parts = item.strip().split(';')
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        result[name] = quality
+    return result
+
+
+def negotiate_encoding(header, preferred):
+    """
+    Picks the client's highest rated encoding, server preference breaks ties
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for name in preferred:
+        quality = accepted.get(name, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
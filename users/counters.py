@@ -0,0 +1,45 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from users.models import StudyGroup, Lesson, Mark
+
+
+def _aggregate(queryset, group_by, aggregate):
+    return Coalesce(Subquery(queryset.filter(**{group_by: OuterRef('pk')}).order_by()
+                             .values(group_by).annotate(value=aggregate).values('value')), Value(0))
+
+
+def expected_counters():
+    """
+    Counter field -> expression computing its true value, per model
+    """
+    return {
+        StudyGroup: {
+            'student_count': _aggregate(StudyGroup.students.through.objects, 'studygroup_id', Count('id')),
+            'teacher_count': _aggregate(StudyGroup.teachers.through.objects, 'studygroup_id', Count('id')),
+            'lesson_count': _aggregate(Lesson.all_objects, 'group_id', Count('id')),
+        },
+        Lesson: {
+            'attendance_count': _aggregate(Lesson.attendances.through.objects, 'lesson_id', Count('id')),
+            'mark_count': _aggregate(Mark.objects, 'lesson_id', Count('id')),
+            'mark_sum': _aggregate(Mark.objects, 'lesson_id', Sum('mark')),
+        },
+    }
+
+
+def stale_rows(model, counters):
+    """
+    Rows where any counter differs from its true value
+    """
+    annotations = {'expected_' + field: expression for field, expression in counters.items()}
+    mismatch = Q()
+    for field in counters:
+        mismatch |= ~Q(**{field: F('expected_' + field)})
+    return model.all_objects.annotate(**annotations).filter(mismatch)
+
+
+def recompute(model, counters, ids=None):
+    rows = model.all_objects.all()
+    if ids is not None:
+        rows = rows.filter(pk__in=ids)
+    return rows.update(**counters)
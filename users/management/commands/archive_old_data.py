@@ -0,0 +1,73 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_date
+
+from users.models import StudyGroup, Lesson, Mark, ArchivedMark, ArchivedAttendance
+from users.signals import change_counter
+
+Attendance = Lesson.attendances.through
+
+
+class Command(BaseCommand):
+    help = 'Archives groups finished before --before and moves marks and attendances of archived lessons ' \
+           'into the archive tables in bounded chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Archive groups whose last lesson (or creation, if they have '
+                                             'no dated lessons) is before this date, YYYY-MM-DD')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between chunks')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            before = parse_date(options['before'])
+            if before is None:
+                raise CommandError('Invalid date: ' + options['before'])
+            self.archive_groups(before)
+
+        moved = self.move_in_chunks(Mark.objects.filter(lesson__archived=True), self.move_marks, options)
+        self.stdout.write('Moved %d marks' % moved)
+        moved = self.move_in_chunks(Attendance.objects.filter(lesson__archived=True), self.move_attendances, options)
+        self.stdout.write('Moved %d attendances' % moved)
+
+    def archive_groups(self, before):
+        groups = StudyGroup.objects.annotate(last_lesson=Max('lessons__date')) \
+            .filter(Q(last_lesson__date__lt=before) | Q(last_lesson__isnull=True, created__date__lt=before))
+        count = 0
+        for group in groups:
+            with transaction.atomic():
+                group.archive()
+            count += 1
+        self.stdout.write('Archived %d groups' % count)
+
+    def move_in_chunks(self, queryset, move, options):
+        total = 0
+        while True:
+            with transaction.atomic():
+                # of=('self',) keeps the join through lesson__archived from locking the lessons too
+                rows = list(queryset.order_by('id').select_for_update(of=('self',))[:options['chunk_size']])
+                if not rows:
+                    return total
+                move(rows)
+            total += len(rows)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+    def move_marks(self, marks):
+        ArchivedMark.objects.bulk_create(
+            ArchivedMark(student_id=mark.student_id, lesson_id=mark.lesson_id, mark=mark.mark) for mark in marks)
+        # MarkQuerySet.delete() updates mark_count/mark_sum once per lesson of the chunk
+        Mark.objects.filter(id__in=[mark.id for mark in marks]).delete()
+
+    def move_attendances(self, attendances):
+        ArchivedAttendance.objects.bulk_create(
+            ArchivedAttendance(student_id=attendance.user_id, lesson_id=attendance.lesson_id)
+            for attendance in attendances)
+        # deleting through rows directly sends no m2m_changed, counted here once per lesson of the chunk
+        for lesson_id, count in Counter(attendance.lesson_id for attendance in attendances).items():
+            change_counter(Lesson, [lesson_id], 'attendance_count', -count)
+        Attendance.objects.filter(id__in=[attendance.id for attendance in attendances]).delete()
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from users.compression import ENCODERS, available_encodings
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Reports bytes on wire and compression CPU cost per encoding for the main endpoints of a user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='User whose responses are measured')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError('User %s does not exist' % options['email'])
+
+        paths = ['/api/v1/me/', '/api/v1/groups/', '/api/v1/me/schedule/']
+        groups = user.teaching_groups if user.role == User.Role.TEACHER else user.studying_groups
+        for group_id in groups.values_list('id', flat=True)[:3]:
+            paths.append('/api/v1/groups/%d/lessons/' % group_id)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        encodings = available_encodings(list(ENCODERS))
+        self.stdout.write('%-32s %10s ' % ('endpoint', 'identity') +
+                          ' '.join('%18s' % encoding for encoding in encodings))
+        for path in paths:
+            response = client.get(path, HTTP_ACCEPT_ENCODING='identity', SERVER_NAME=settings.ALLOWED_HOSTS[0])
+            if response.status_code != 200:
+                self.stdout.write('%-32s status %d' % (path, response.status_code))
+                continue
+            body = response.content
+            columns = list()
+            for name in encodings:
+                encoder = ENCODERS[name]()
+                started = time.process_time()
+                for _ in range(options['repeat']):
+                    compressed = encoder.compress(body)
+                cpu = (time.process_time() - started) * 1000 / options['repeat']
+                columns.append('%8d %6.2fms' % (len(compressed), cpu))
+            self.stdout.write('%-32s %10d  ' % (path, len(body)) + '  '.join(columns))
@@ -0,0 +1,81 @@
+import random
+import string
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import User, StudyGroup
+from users.search import search_users, search_groups
+
+
+class Rollback(Exception):
+    pass
+
+
+def random_word(length):
+    return ''.join(random.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Seeds users and groups inside a rolled back transaction and measures search latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=1000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded data instead of rolling back')
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        try:
+            with transaction.atomic():
+                self.run(options)
+                if not options['keep']:
+                    raise Rollback()
+        except Rollback:
+            self.stdout.write('Seeded data rolled back')
+
+    def run(self, options):
+        password = make_password(None)
+        started = time.perf_counter()
+        users = (User(email='%s.%d@example.com' % (random_word(8), i),
+                      name='%s %s' % (random_word(6).title(), random_word(9).title()),
+                      role=random.choice(User.Role.values),
+                      password=password)
+                 for i in range(options['users']))
+        batch = list()
+        for user in users:
+            batch.append(user)
+            if len(batch) == options['batch_size']:
+                User.objects.bulk_create(batch)
+                batch = list()
+        User.objects.bulk_create(batch)
+        groups = StudyGroup.objects.bulk_create(
+            StudyGroup(group_title=random_word(6).upper(), subject_title=random_word(10).title())
+            for _ in range(options['groups']))
+        owner = User.objects.order_by('id').first()
+        StudyGroup.teachers.through.objects.bulk_create(
+            StudyGroup.teachers.through(studygroup_id=group.id, user_id=owner.id) for group in groups)
+        self.stdout.write('Seeded %d users and %d groups in %.1fs'
+                          % (options['users'], options['groups'], time.perf_counter() - started))
+
+        for name, func in (('users', lambda q: list(search_users(q))),
+                           ('groups', lambda q: list(search_groups(owner, q)))):
+            for length in (1, 2, 3):
+                timings = list()
+                for _ in range(options['queries']):
+                    query = random_word(length)
+                    started = time.perf_counter()
+                    func(query)
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write('%-6s prefix len %d: p50 %.2fms, p95 %.2fms, max %.2fms'
+                                  % (name, length, percentile(timings, 0.5), percentile(timings, 0.95),
+                                     max(timings)))
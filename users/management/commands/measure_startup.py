@@ -0,0 +1,93 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User, StudyGroup, Lesson
+
+MEASURE = '''
+import io, json, sys, time
+started = time.perf_counter()
+from django.conf import settings
+# the throwaway database of the measuring command
+settings.DATABASES['default']['NAME'] = sys.argv[4]
+from easy_study_backend.wsgi import application
+loaded = time.perf_counter()
+if sys.argv[1] == 'warm':
+    from easy_study_backend.warmup import warm_up_application, warm_up_worker
+    warm_up_application()
+    warm_up_worker()
+warmed = time.perf_counter()
+
+
+def request():
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/v1/groups/', 'QUERY_STRING': '',
+               'SERVER_NAME': sys.argv[2], 'SERVER_PORT': '80', 'wsgi.url_scheme': 'http',
+               'HTTP_AUTHORIZATION': 'Bearer ' + sys.argv[3],
+               'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr}
+    statuses = list()
+    started = time.perf_counter()
+    b''.join(application(environ, lambda status, headers: statuses.append(status)))
+    elapsed = time.perf_counter() - started
+    if not statuses[0].startswith('200'):
+        sys.exit('GET /api/v1/groups/ answered ' + statuses[0])
+    return elapsed
+
+
+first = request()
+second = request()
+print(json.dumps({'load': loaded - started, 'warm_up': warmed - loaded, 'first': first, 'second': second}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measures application load time and first request latency of fresh processes with and without ' \
+           'warm-up. The measured request is an authenticated GET /api/v1/groups/ of a teacher with a group ' \
+           'of lessons, seeded into a throwaway test database (test_<name> like manage.py test, a temporary ' \
+           'file with SQLite) that is dropped afterwards. Needs the right to create databases, do not run it ' \
+           'against the production database server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--lessons', type=int, default=20)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        temporary = None
+        if connection.vendor == 'sqlite':
+            # subprocesses cannot see the in-memory database SQLite tests use by default
+            descriptor, temporary = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(descriptor)
+            connection.settings_dict['TEST']['NAME'] = temporary
+        test_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            teacher = User.objects.create_user('startup@example.com', 'Startup teacher', User.Role.TEACHER)
+            group = StudyGroup.objects.create(group_title='Startup', subject_title='Startup measurement')
+            group.teachers.add(teacher)
+            for number in range(options['lessons']):
+                Lesson.objects.create(title='Lesson %d' % number, group=group)
+            self.measure(options, str(AccessToken.for_user(teacher)), test_name)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if temporary is not None and os.path.exists(temporary):
+                os.remove(temporary)
+
+    def measure(self, options, token, database):
+        for mode in ('cold', 'warm'):
+            results = list()
+            for _ in range(options['runs']):
+                process = subprocess.run([sys.executable, '-c', MEASURE, mode, settings.ALLOWED_HOSTS[0], token,
+                                          database],
+                                         capture_output=True, text=True)
+                if process.returncode != 0:
+                    raise CommandError(process.stderr.strip().splitlines()[-1])
+                results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+            average = {key: sum(result[key] for result in results) / len(results) * 1000 for key in results[0]}
+            self.stdout.write('%s: load %.1fms, warm-up %.1fms, first request %.1fms, second request %.1fms'
+                              % (mode, average['load'], average['warm_up'], average['first'], average['second']))
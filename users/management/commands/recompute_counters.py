@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.counters import expected_counters, recompute, stale_rows
+
+
+class Command(BaseCommand):
+    help = 'Verifies the denormalized counters of groups and lessons and recomputes the stale ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only report stale rows, fail if there are any')
+        parser.add_argument('--all', action='store_true', help='Recompute every row instead of only stale ones')
+
+    def handle(self, *args, **options):
+        stale_total = 0
+        for model, counters in expected_counters().items():
+            name = model._meta.verbose_name_plural
+            if options['all'] and not options['verify']:
+                self.stdout.write('Recomputed %d %s' % (recompute(model, counters), name))
+                continue
+
+            stale = list(stale_rows(model, counters).values_list('pk', flat=True))
+            stale_total += len(stale)
+            if options['verify']:
+                self.stdout.write('%d stale %s%s' % (len(stale), name, (': ' + str(stale[:20])) if stale else ''))
+            else:
+                self.stdout.write('Recomputed %d stale %s' % (recompute(model, counters, stale), name))
+
+        if options['verify'] and stale_total:
+            raise CommandError('%d rows have stale counters' % stale_total)
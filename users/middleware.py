@@ -0,0 +1,243 @@
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from users.compression import ENCODERS, available_encodings, negotiate_encoding
+from users.profiling import PROFILERS, QueryRecorder
+from users.query_budget import QueryBudgetExceeded, get_budget
+
+logger = logging.getLogger(__name__)
+
+# Only what the API renders. The API authenticates with a JWT header that a cross-site page
+# cannot make the browser send, while HTML pages (admin, browsable API, api-auth login) are
+# authenticated by the session cookie and carry a CSRF token next to reflected input such as
+# ?q=, the setup in which compressed sizes leak the token (BREACH). Static files come already
+# compressed from WhiteNoise.
+COMPRESSIBLE_CONTENT_TYPES = (
+    'application/json',
+    'text/calendar',
+    'text/plain',
+)
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Sheds load with 503 and Retry-After once MAX_CONCURRENT_REQUESTS requests are already
+    in flight across all workers. Every process counts its own requests and publishes the count
+    under a per-process cache key that expires after CONCURRENCY_COUNTER_TTL, the limit applies
+    to the sum over the processes in a registry key. Only the owner rewrites its key, so the count
+    of a worker killed mid-request expires with it however busy the other workers are.
+    The other counts are read without a lock, simultaneous arrivals may overshoot the limit
+    a little. Zero or unset disables the limit.
+    """
+    registry_key = 'concurrency:workers'
+    key_format = 'concurrency:in_flight:%d'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limit = getattr(settings, 'MAX_CONCURRENT_REQUESTS', 0)
+        self.retry_after = getattr(settings, 'CONCURRENCY_RETRY_AFTER', 1)
+        self.ttl = getattr(settings, 'CONCURRENCY_COUNTER_TTL', 60)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+
+    def __call__(self, request):
+        if self.limit <= 0:
+            return self.get_response(request)
+
+        if not self.admit():
+            response = JsonResponse({'error': 'ServiceUnavailable', 'message': 'Server is overloaded, retry later'},
+                                    status=503)
+            response['Retry-After'] = str(self.retry_after)
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            self.release()
+
+    def admit(self):
+        # the middleware is created in the gunicorn master (preload_app), the pid is the worker's
+        pid = os.getpid()
+        workers = cache.get(self.registry_key) or []
+        keys = [self.key_format % worker for worker in workers if worker != pid]
+        others = cache.get_many(keys)
+        with self.lock:
+            if sum(others.values()) + self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            cache.set(self.key_format % pid, self.in_flight, self.ttl)
+        if pid not in workers or len(others) < len(keys):
+            # registers this process and drops the ones whose count expired, a process dropped
+            # by a concurrent rewrite registers again on its next request
+            live = [worker for worker in workers if self.key_format % worker in others]
+            cache.set(self.registry_key, live + [pid], None)
+        return True
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+            cache.set(self.key_format % os.getpid(), self.in_flight, self.ttl)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best encoding from Accept-Encoding among COMPRESS_ENCODINGS
+    (zstd and br only when zstandard/brotli are installed). Bodies below COMPRESS_MIN_SIZE and
+    responses that already carry a Content-Encoding (WhiteNoise static files) are left alone.
+    Streaming responses are compressed chunk by chunk only when COMPRESS_STREAMING is enabled.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.encodings = available_encodings(getattr(settings, 'COMPRESS_ENCODINGS', ['gzip']))
+        self.min_size = getattr(settings, 'COMPRESS_MIN_SIZE', 1024)
+        self.streaming = getattr(settings, 'COMPRESS_STREAMING', False)
+        self.content_types = getattr(settings, 'COMPRESS_CONTENT_TYPES', COMPRESSIBLE_CONTENT_TYPES)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.encodings or response.has_header('Content-Encoding'):
+            return response
+        if response.get('Content-Type', '').split(';')[0].strip() not in self.content_types:
+            return response
+        if response.streaming and not self.streaming:
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.encodings)
+        if encoding is None:
+            return response
+
+        encoder = ENCODERS[encoding]()
+        if response.streaming:
+            response.streaming_content = encoder.compressobj().stream(response.streaming_content)
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+        else:
+            compressed = encoder.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # the compressed representation differs byte-wise, a strong ETag would be wrong
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests of admins sending "X-Profile: cprofile" or "X-Profile: sample" and every
+    request whose path matches PROFILING_PATHS, the result is stored as a RequestProfile.
+    Not installed at all unless PROFILING_ENABLED is set.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.paths = [re.compile(path) for path in getattr(settings, 'PROFILING_PATHS', [])]
+        self.interval = getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.001)
+
+    def __call__(self, request):
+        mode = self.get_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        profiler = PROFILERS[mode](interval=self.interval)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+        duration = (time.perf_counter() - started) * 1000
+
+        from users.models import RequestProfile
+        user = self.get_user(request)
+        profile = RequestProfile.objects.create(user=user if user is not None and user.is_authenticated else None,
+                                                method=request.method, path=request.get_full_path()[:2048],
+                                                status_code=response.status_code, duration=duration, mode=mode,
+                                                queries=recorder.queries, data=profiler.result())
+        response['X-Profile-Id'] = str(profile.id)
+        return response
+
+    def get_mode(self, request):
+        header = request.META.get('HTTP_X_PROFILE')
+        if header is not None:
+            mode = header if header in PROFILERS else 'cprofile'
+            user = self.get_user(request)
+            return mode if user is not None and user.is_authenticated and user.is_staff else None
+        if any(path.match(request.path) for path in self.paths):
+            return 'cprofile'
+        return None
+
+    def get_user(self, request):
+        """
+        API requests authenticate in the view, the JWT is checked here to know who asks for a profile
+        """
+        if not hasattr(request, 'profiling_user'):
+            from rest_framework.exceptions import APIException
+            from rest_framework_simplejwt.authentication import JWTAuthentication
+            request.profiling_user = getattr(request, 'user', None)
+            if request.profiling_user is None or not request.profiling_user.is_authenticated:
+                try:
+                    result = JWTAuthentication().authenticate(request)
+                except APIException:
+                    result = None
+                request.profiling_user = result[0] if result else None
+        return request.profiling_user
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the queries of every request and compares them with the query budget of its view,
+    logs or raises QueryBudgetExceeded depending on QUERY_BUDGET_MODE, not installed when 'off'
+    """
+    def __init__(self, get_response):
+        if getattr(settings, 'QUERY_BUDGET_MODE', 'off') == 'off':
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view_class = getattr(match.func, 'cls', None) if match is not None else None
+        if view_class is None:
+            return response
+        budget = get_budget(view_class, request, response)
+        if budget is None or counter.count <= budget:
+            return response
+
+        message = '%s %s (%s) ran %d queries, budget is %d' % (request.method, request.path, view_class.__name__,
+                                                                counter.count, budget)
+        if getattr(settings, 'QUERY_BUDGET_MODE', 'off') == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+        return response
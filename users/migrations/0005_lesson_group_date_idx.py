@@ -0,0 +1,22 @@
+# Generated by Django 4.0.2 on 2026-10-19 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_lesson_attendances_alter_studygroup_students_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lesson',
+            name='date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['group', 'date'], name='lesson_group_date_idx'),
+        ),
+    ]
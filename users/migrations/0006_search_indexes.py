@@ -0,0 +1,52 @@
+from django.db import migrations
+
+# Prefix search uses istartswith, which is UPPER(col) LIKE UPPER('q%') on Postgres,
+# so the btree indexes are built over UPPER(col) with varchar_pattern_ops.
+# Trigram indexes cover the word-prefix (icontains) lookups on names and titles.
+POSTGRES_INDEXES = [
+    ('users_user_email_prefix_idx', 'users_user', 'UPPER("email") varchar_pattern_ops', 'btree'),
+    ('users_user_name_prefix_idx', 'users_user', 'UPPER("name") varchar_pattern_ops', 'btree'),
+    ('users_user_name_trgm_idx', 'users_user', 'UPPER("name") gin_trgm_ops', 'gin'),
+    ('users_studygroup_group_title_prefix_idx', 'users_studygroup', 'UPPER("group_title") varchar_pattern_ops',
+     'btree'),
+    ('users_studygroup_subject_title_prefix_idx', 'users_studygroup', 'UPPER("subject_title") varchar_pattern_ops',
+     'btree'),
+    ('users_studygroup_subject_title_trgm_idx', 'users_studygroup', 'UPPER("subject_title") gin_trgm_ops', 'gin'),
+]
+
+# Replaced by NOCASE indexes in 0011, SQLite does not use these for LIKE
+FALLBACK_INDEXES = [
+    ('users_user_name_prefix_idx', 'users_user', '"name"'),
+    ('users_studygroup_group_title_prefix_idx', 'users_studygroup', '"group_title"'),
+    ('users_studygroup_subject_title_prefix_idx', 'users_studygroup', '"subject_title"'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, table, expression, method in POSTGRES_INDEXES:
+            schema_editor.execute('CREATE INDEX IF NOT EXISTS %s ON %s USING %s (%s)' % (name, table, method, expression))
+    else:
+        for name, table, expression in FALLBACK_INDEXES:
+            schema_editor.execute('CREATE INDEX IF NOT EXISTS %s ON %s (%s)' % (name, table, expression))
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        names = [index[0] for index in POSTGRES_INDEXES]
+    else:
+        names = [index[0] for index in FALLBACK_INDEXES]
+    for name in names:
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_lesson_group_date_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.2 on 2026-10-19 15:41
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_marks(apps, schema_editor):
+    """
+    Keeps the latest mark of every (student, lesson) pair created by concurrent writes
+    """
+    Mark = apps.get_model('users', 'Mark')
+    duplicates = Mark.objects.values('student_id', 'lesson_id') \
+        .annotate(count=Count('id'), latest=Max('id')).filter(count__gt=1)
+    for duplicate in duplicates:
+        Mark.objects.filter(student_id=duplicate['student_id'], lesson_id=duplicate['lesson_id']) \
+            .exclude(id=duplicate['latest']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_marks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='mark',
+            constraint=models.UniqueConstraint(fields=('student', 'lesson'), name='unique_mark_per_student_lesson'),
+        ),
+    ]
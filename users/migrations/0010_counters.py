@@ -0,0 +1,67 @@
+# Generated by Django 4.0.2 on 2026-10-19 15:45
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def aggregate(queryset, group_by, function):
+    return Coalesce(Subquery(queryset.filter(**{group_by: OuterRef('pk')}).order_by()
+                             .values(group_by).annotate(value=function).values('value')), Value(0))
+
+
+def populate_counters(apps, schema_editor):
+    StudyGroup = apps.get_model('users', 'StudyGroup')
+    Lesson = apps.get_model('users', 'Lesson')
+    Mark = apps.get_model('users', 'Mark')
+    StudyGroup._base_manager.update(
+        student_count=aggregate(StudyGroup.students.through.objects, 'studygroup_id', Count('id')),
+        teacher_count=aggregate(StudyGroup.teachers.through.objects, 'studygroup_id', Count('id')),
+        lesson_count=aggregate(Lesson._base_manager, 'group_id', Count('id')),
+    )
+    Lesson._base_manager.update(
+        attendance_count=aggregate(Lesson.attendances.through.objects, 'lesson_id', Count('id')),
+        mark_count=aggregate(Mark._base_manager, 'lesson_id', Count('id')),
+        mark_sum=aggregate(Mark._base_manager, 'lesson_id', Sum('mark')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_request_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='attendance_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='mark_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='mark_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studygroup',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studygroup',
+            name='student_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studygroup',
+            name='teacher_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
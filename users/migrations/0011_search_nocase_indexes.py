@@ -0,0 +1,40 @@
+from django.db import migrations
+
+# SQLite uses an index for LIKE 'q%' only when the index has the NOCASE collation
+# (LIKE is case-insensitive), the plain indexes of 0006 were never picked
+NOCASE_INDEXES = [
+    ('users_user_email_prefix_idx', 'users_user', '"email"'),
+    ('users_user_name_prefix_idx', 'users_user', '"name"'),
+    ('users_studygroup_group_title_prefix_idx', 'users_studygroup', '"group_title"'),
+    ('users_studygroup_subject_title_prefix_idx', 'users_studygroup', '"subject_title"'),
+]
+
+PLAIN_INDEXES = NOCASE_INDEXES[1:]
+
+
+def create_nocase_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    for name, table, column in NOCASE_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % name)
+        schema_editor.execute('CREATE INDEX %s ON %s (%s COLLATE NOCASE)' % (name, table, column))
+
+
+def restore_plain_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    for name, table, column in NOCASE_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % name)
+    for name, table, column in PLAIN_INDEXES:
+        schema_editor.execute('CREATE INDEX %s ON %s (%s)' % (name, table, column))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_nocase_indexes, restore_plain_indexes),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+import threading
+from contextlib import contextmanager
+
+from django.db import models, transaction
 from django.contrib.auth.models import (
     BaseUserManager, AbstractBaseUser
 )
@@ -88,6 +91,52 @@ class User(AbstractBaseUser):
             self.set_password(password)
         self.save()
 
+    def group_ids(self):
+        """
+        Ids of the groups the user studies or teaches in, as a subquery. Taken straight from the
+        through tables, joining students and teachers would multiply the rows by students x teachers
+        """
+        return StudyGroup.students.through.objects.filter(user_id=self.id).values('studygroup_id') \
+            .union(StudyGroup.teachers.through.objects.filter(user_id=self.id).values('studygroup_id'))
+
+
+class ActiveManager(models.Manager):
+    """
+    Default manager of archivable models, hides archived rows (related managers use it too)
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(archived=False)
+
+
+# ids of the groups whose delete is in progress in this thread, added by a pre_delete receiver
+# of users.signals so the cascade does not update the counters of groups about to disappear
+_deleting = threading.local()
+
+
+def deleting_groups():
+    if not hasattr(_deleting, 'groups'):
+        _deleting.groups = set()
+    return _deleting.groups
+
+
+@contextmanager
+def tracking_group_deletes():
+    """
+    Forgets the groups marked by a delete once it returns or fails, a failed delete never sends post_delete
+    """
+    groups = deleting_groups()
+    marked = set(groups)
+    try:
+        yield
+    finally:
+        groups.intersection_update(marked)
+
+
+class StudyGroupQuerySet(models.QuerySet):
+    def delete(self):
+        with tracking_group_deletes():
+            return super().delete()
+
 
 class StudyGroup(models.Model):
     created = models.DateTimeField(auto_now_add=True)
@@ -95,6 +144,24 @@ class StudyGroup(models.Model):
     subject_title = models.CharField(max_length=50, blank=False)
     students = models.ManyToManyField(User, related_name='studying_groups', blank=True)
     teachers = models.ManyToManyField(User, related_name='teaching_groups', blank=True)
+    archived = models.BooleanField(default=False)
+
+    # maintained by users.signals, recomputed by the recompute_counters command
+    student_count = models.PositiveIntegerField(default=0)
+    teacher_count = models.PositiveIntegerField(default=0)
+    lesson_count = models.PositiveIntegerField(default=0)
+
+    objects = ActiveManager.from_queryset(StudyGroupQuerySet)()
+    all_objects = models.Manager.from_queryset(StudyGroupQuerySet)()
+
+    def delete(self, using=None, keep_parents=False):
+        with tracking_group_deletes():
+            return super().delete(using, keep_parents)
+
+    def archive(self):
+        self.archived = True
+        self.save(update_fields=['archived'])
+        Lesson.all_objects.filter(group=self).update(archived=True)
 
 
 class Lesson(models.Model):
@@ -102,9 +169,84 @@ class Lesson(models.Model):
     date = models.DateTimeField(null=True, blank=True)
     group = models.ForeignKey(StudyGroup, related_name='lessons', on_delete=models.CASCADE)
     attendances = models.ManyToManyField(User, related_name='attendances', blank=True)
+    archived = models.BooleanField(default=False)
+
+    # maintained by users.signals, recomputed by the recompute_counters command
+    attendance_count = models.PositiveIntegerField(default=0)
+    mark_count = models.PositiveIntegerField(default=0)
+    mark_sum = models.FloatField(default=0)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'date'], name='lesson_group_date_idx'),
+        ]
+
+
+class MarkQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Takes the marks out of the counters of their lessons with one update per lesson, Mark has
+        no delete signals so the rows themselves are deleted without being loaded
+        """
+        with transaction.atomic(using=self.db):
+            totals = self.order_by().values('lesson_id').annotate(count=models.Count('id'), total=models.Sum('mark'))
+            for row in totals:
+                Lesson.all_objects.filter(pk=row['lesson_id']).update(mark_count=models.F('mark_count') - row['count'],
+                                                                      mark_sum=models.F('mark_sum') - row['total'])
+            return super().delete()
 
 
 class Mark(models.Model):
     student = models.ForeignKey(User, related_name='marks', on_delete=models.CASCADE)
     lesson = models.ForeignKey(Lesson, related_name='marks', on_delete=models.CASCADE)
     mark = models.FloatField(blank=False)
+
+    objects = MarkQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'lesson'], name='unique_mark_per_student_lesson'),
+        ]
+
+    def delete(self, using=None, keep_parents=False):
+        return Mark.objects.using(using).filter(pk=self.pk).delete()
+
+
+class ArchivedMark(models.Model):
+    """
+    Marks of archived lessons, moved out of Mark by the archive_old_data command
+    """
+    student = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    lesson = models.ForeignKey(Lesson, related_name='+', on_delete=models.CASCADE)
+    mark = models.FloatField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class ArchivedAttendance(models.Model):
+    """
+    Attendances of archived lessons, moved out of Lesson.attendances by the archive_old_data command
+    """
+    student = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    lesson = models.ForeignKey(Lesson, related_name='+', on_delete=models.CASCADE)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class RequestProfile(models.Model):
+    """
+    Profile of a single request captured by ProfilingMiddleware
+    """
+    created = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(User, related_name='+', null=True, on_delete=models.SET_NULL)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    status_code = models.PositiveSmallIntegerField()
+    duration = models.FloatField()
+    mode = models.CharField(max_length=10)
+    queries = models.JSONField(default=list)
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ['-created']
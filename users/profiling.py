@@ -0,0 +1,126 @@
+import cProfile
+import io
+import json
+import marshal
+import pstats
+import sys
+import threading
+import time
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper() callable collecting every SQL statement with its duration
+    """
+    def __init__(self):
+        self.queries = list()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({'sql': sql, 'duration': (time.perf_counter() - started) * 1000})
+
+
+class DeterministicProfiler:
+    """
+    cProfile, the result is the marshalled stats loadable with pstats / snakeviz (.prof)
+    """
+    mode = 'cprofile'
+
+    def __init__(self, interval=None):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def result(self):
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the profiled thread from a background thread every interval seconds,
+    the result is a speedscope sampled profile (https://www.speedscope.app)
+    """
+    mode = 'sample'
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = list()
+        self.stopped = threading.Event()
+        self.thread_id = None
+        self.sampler = None
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.sampler = threading.Thread(target=self.run, daemon=True)
+        self.started = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.sampler.join()
+        self.duration = time.perf_counter() - self.started
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = list()
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+
+    def result(self):
+        frames = list()
+        indexes = dict()
+        samples = list()
+        for stack in self.samples:
+            sample = list()
+            for frame in stack:
+                if frame not in indexes:
+                    indexes[frame] = len(frames)
+                    frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+                sample.append(indexes[frame])
+            samples.append(sample)
+        interval = self.interval * 1000
+        return json.dumps({
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': 'request',
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': len(samples) * interval,
+                'samples': samples,
+                'weights': [interval] * len(samples),
+            }],
+            'exporter': 'easy_study_backend',
+        }).encode()
+
+
+PROFILERS = {
+    DeterministicProfiler.mode: DeterministicProfiler,
+    SamplingProfiler.mode: SamplingProfiler,
+}
+
+
+def stats_summary(data, limit=30):
+    """
+    Human readable top functions of a marshalled cProfile result
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(stream=stream)
+    stats.stats = marshal.loads(data)
+    stats.get_top_level_stats()
+    stats.sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
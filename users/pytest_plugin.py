@@ -0,0 +1,16 @@
+"""
+pytest plugin enforcing query budgets: requests going through the middleware stack
+(Client / APIClient) raise QueryBudgetExceeded when their view exceeds its budget.
+Tests that knowingly exceed it are marked with @pytest.mark.no_query_budget.
+"""
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'no_query_budget: only log requests exceeding their query budget')
+
+
+@pytest.fixture(autouse=True)
+def query_budget_mode(request, settings):
+    settings.QUERY_BUDGET_MODE = 'log' if request.node.get_closest_marker('no_query_budget') else 'raise'
+    return settings.QUERY_BUDGET_MODE
@@ -0,0 +1,81 @@
+"""
+Query budgets: every API view declares how many SQL queries a request may take,
+as the query_budget class attribute or with the @query_budget decorator.
+
+A budget is an int, a callable (request, response) -> int for budgets that grow with
+the result, or a dict of those by lowercase HTTP method with an optional 'default'.
+QueryBudgetMiddleware counts the queries of each request and, depending on
+QUERY_BUDGET_MODE, logs ('log') or raises QueryBudgetExceeded ('raise') when the
+budget is exceeded. 'off' removes the middleware.
+"""
+from django.core import checks
+from django.urls import URLPattern, URLResolver
+from rest_framework.views import APIView
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(default=None, **methods):
+    """
+    Class decorator, @query_budget(5) or @query_budget(get=per_item(3, 2), post=6)
+    """
+    def decorator(view_class):
+        view_class.query_budget = default if not methods else dict(methods, default=default)
+        return view_class
+    return decorator
+
+
+def result_size(data, key=None):
+    if key is not None and isinstance(data, dict):
+        data = data.get(key, ())
+    if isinstance(data, dict) and 'results' in data:
+        data = data['results']
+    if isinstance(data, dict) and 'data' in data:
+        data = data['data']
+    return len(data) if isinstance(data, (list, tuple)) else 0
+
+
+def per_item(base, per_item_queries, key=None):
+    """
+    Budget of base queries plus per_item_queries for every element of the response list
+    (or of response.data[key])
+    """
+    def budget(request, response):
+        return base + per_item_queries * result_size(getattr(response, 'data', None), key)
+    return budget
+
+
+def get_budget(view_class, request, response):
+    budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        budget = budget.get(request.method.lower(), budget.get('default'))
+    if callable(budget):
+        budget = budget(request, response)
+    return budget
+
+
+def iter_api_views(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_api_views(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, 'cls', None)
+            if view_class is not None and issubclass(view_class, APIView):
+                yield prefix + str(pattern.pattern), view_class
+
+
+@checks.register()
+def check_query_budgets(app_configs, **kwargs):
+    """
+    Every API view routed by users/urls.py has to declare a query budget
+    """
+    from users import urls
+    warnings = list()
+    for route, view_class in iter_api_views(urls.urlpatterns):
+        if getattr(view_class, 'query_budget', None) is None:
+            warnings.append(checks.Warning('%s has no query budget' % view_class.__name__,
+                                           hint='Set query_budget on the view or use @query_budget',
+                                           obj=route, id='users.W001'))
+    return warnings
@@ -0,0 +1,14 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class NormalizedJSONRenderer(JSONRenderer):
+    """
+    Plain JSON selected by ?format=normalized, serializers with NormalizedMixin
+    then emit every entity once in top-level maps and reference it by id
+    """
+    format = 'normalized'
+
+
+def is_normalized(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == NormalizedJSONRenderer.format
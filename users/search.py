@@ -0,0 +1,34 @@
+from django.db import connection
+from django.db.models import Q
+
+from users.models import User, StudyGroup
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+
+
+def _word_prefix(field, query):
+    """
+    Matches the query at the start of the value or, on Postgres where the trigram indexes
+    serve icontains, also at the start of any word in it. Elsewhere the icontains would
+    turn the indexed prefix lookup into a full scan.
+    """
+    condition = Q(**{field + '__istartswith': query})
+    if connection.vendor == 'postgresql':
+        condition |= Q(**{field + '__icontains': ' ' + query})
+    return condition
+
+
+def search_users(query, limit=SEARCH_DEFAULT_LIMIT):
+    return User.objects.filter(Q(email__istartswith=query) | _word_prefix('name', query)) \
+               .only('id', 'email', 'name').order_by('email')[:limit]
+
+
+def search_groups(user, query, limit=SEARCH_DEFAULT_LIMIT):
+    """
+    Searches only among the groups the user studies or teaches in
+    """
+    groups = StudyGroup.objects.filter(id__in=user.group_ids())
+    return groups.filter(Q(group_title__istartswith=query) | _word_prefix('subject_title', query)) \
+               .only('id', 'group_title', 'subject_title', 'student_count', 'teacher_count', 'lesson_count') \
+               .order_by('group_title', 'id')[:limit]
@@ -1,23 +1,130 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from users.models import User, StudyGroup, Lesson, Mark
+from rest_framework.permissions import SAFE_METHODS
+from users.models import User, StudyGroup, Lesson, Mark, RequestProfile
+
+
+class EntityStore:
+    """
+    Collects serialized entities by type and id for the normalized response format
+    """
+    def __init__(self):
+        self.entities = dict()
+
+    def add(self, entity_type, data):
+        # the same object may be serialized by a short and a full serializer, keep the union of fields
+        self.entities.setdefault(entity_type, dict()).setdefault(data['id'], dict()).update(data)
+        return data['id']
+
+    def wrap(self, data):
+        if isinstance(data, dict) and 'results' in data:
+            return data | self.entities
+        return {'data': data} | self.entities
+
+
+class NormalizedMixin:
+    """
+    Replaces the representation with the object id when an EntityStore is passed
+    in the 'entities' context, the full representation goes to the store
+    """
+    entity_type = None
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        store = self.context.get('entities')
+        if store is None:
+            return data
+        return store.add(self.entity_type, data)
+
+    @property
+    def data(self):
+        if self.context.get('entities') is None:
+            return super().data
+        # a root object is replaced by its id too, which Serializer.data cannot wrap into a ReturnDict
+        return super(serializers.Serializer, self).data
+
+
+def parse_field_list(value):
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SelectableFieldsMixin:
+    """
+    Keeps only the fields listed in ?fields= and, of the relation fields (prefetch_map keys),
+    only the ones listed in ?include=. A missing parameter selects everything, id is always kept.
+    Applies to the serializer that receives the request in its context, nested ones stay complete.
+    Writes ignore the parameters, a dropped field would skip the validation of its input.
+    """
+    prefetch_map = dict()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            selected = self.selected_fields(request)
+            for name in list(self.fields):
+                if name not in selected:
+                    self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, request):
+        selected = set(cls.Meta.fields)
+        if request.method not in SAFE_METHODS:
+            return selected
+        fields = parse_field_list(request.query_params.get('fields'))
+        if fields is not None:
+            selected &= fields | {'id'}
+        include = parse_field_list(request.query_params.get('include'))
+        if include is not None:
+            selected -= set(cls.prefetch_map) - include
+        return selected
+
+    @classmethod
+    def get_prefetches(cls, request=None):
+        """
+        prefetch_related() lookups for the relations the request selects, all of them without a request
+        """
+        selected = cls.selected_fields(request) if request is not None else set(cls.Meta.fields)
+        return [lookup for name, lookups in cls.prefetch_map.items() if name in selected for lookup in lookups]
+
+
+class SimpleUserSerializer(NormalizedMixin, SelectableFieldsMixin, serializers.ModelSerializer):
+    entity_type = 'users'
 
-
-class SimpleUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'name']
 
 
-class StudyGroupSerializer(serializers.ModelSerializer):
+class SimpleStudyGroupSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = StudyGroup
+        fields = ['id', 'group_title', 'subject_title', 'student_count', 'teacher_count', 'lesson_count']
+
+
+class StudyGroupSerializer(NormalizedMixin, SelectableFieldsMixin, serializers.ModelSerializer):
+    entity_type = 'groups'
+    prefetch_map = {
+        'students': ['students'],
+        'teachers': ['teachers'],
+        'lessons': ['lessons'],
+    }
     students = SimpleUserSerializer(read_only=True, many=True)
     teachers = SimpleUserSerializer(read_only=True, many=True)
 
     class Meta:
         model = StudyGroup
-        fields = ['id', 'group_title', 'subject_title', 'students', 'teachers', 'lessons']
+        fields = ['id', 'group_title', 'subject_title', 'student_count', 'teacher_count', 'lesson_count',
+                  'students', 'teachers', 'lessons']
 
 
-class MarkSerializer(serializers.ModelSerializer):
+class MarkSerializer(NormalizedMixin, SelectableFieldsMixin, serializers.ModelSerializer):
+    entity_type = 'marks'
+    prefetch_map = {
+        'student': ['student'],
+    }
     student = SimpleUserSerializer(read_only=True, many=False)
 
     class Meta:
@@ -25,22 +132,45 @@ class MarkSerializer(serializers.ModelSerializer):
         fields = ['id', 'student', 'lesson', 'mark']
 
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(NormalizedMixin, SelectableFieldsMixin, serializers.ModelSerializer):
+    entity_type = 'lessons'
+    prefetch_map = {
+        'marks': ['marks__student'],
+        'attendances': ['attendances'],
+    }
     marks = MarkSerializer(read_only=True, many=True)
     attendances = SimpleUserSerializer(read_only=True, many=True)
 
     class Meta:
         model = Lesson
-        fields = ['id', 'title', 'date', 'group', 'marks', 'attendances']
+        fields = ['id', 'title', 'date', 'group', 'attendance_count', 'mark_count', 'mark_sum',
+                  'marks', 'attendances']
 
 
-class StudentLessonSerializer(serializers.ModelSerializer):
+class StudentLessonSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Lesson
         fields = ['id', 'title', 'date', 'group']
 
 
-class UserSerializer(serializers.ModelSerializer):
+class ScheduleLessonSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
+    group_title = serializers.CharField(source='group.group_title', read_only=True)
+    subject_title = serializers.CharField(source='group.subject_title', read_only=True)
+
+    class Meta:
+        model = Lesson
+        fields = ['id', 'title', 'date', 'group', 'group_title', 'subject_title']
+
+
+class UserSerializer(NormalizedMixin, SelectableFieldsMixin, serializers.ModelSerializer):
+    entity_type = 'users'
+    prefetch_map = {
+        'studying_groups': ['studying_groups__students', 'studying_groups__teachers', 'studying_groups__lessons'],
+        'teaching_groups': ['teaching_groups__students', 'teaching_groups__teachers', 'teaching_groups__lessons'],
+        # attendances hide archived lessons through Lesson's default manager, marks are filtered the same way
+        'marks': [Prefetch('marks', queryset=Mark.objects.filter(lesson__archived=False))],
+        'attendances': ['attendances'],
+    }
     studying_groups = StudyGroupSerializer(read_only=True, many=True)
     teaching_groups = StudyGroupSerializer(read_only=True, many=True)
 
@@ -48,3 +178,14 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'email', 'name', 'role', 'last_login',
                   'studying_groups', 'teaching_groups', 'marks', 'attendances']
+
+
+class RequestProfileSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
+    query_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RequestProfile
+        fields = ['id', 'created', 'user', 'method', 'path', 'status_code', 'duration', 'mode', 'query_count']
+
+    def get_query_count(self, profile):
+        return len(profile.queries)
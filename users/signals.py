@@ -0,0 +1,102 @@
+"""
+Keeps the denormalized counters of StudyGroup and Lesson in sync with F() updates,
+bulk operations bypass signals and need the recompute_counters command.
+
+Mark deletes are counted by MarkQuerySet.delete() instead of per-row signals, so marks
+stay fast-deletable. Rows removed by the cascade of a deleted group or lesson are not
+counted at all, their counters are deleted with them.
+"""
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import User, StudyGroup, Lesson, Mark, deleting_groups
+
+
+def change_counter(model, ids, field, delta):
+    if ids and delta:
+        model.all_objects.filter(pk__in=ids).update(**{field: F(field) + delta})
+
+
+def connect_m2m_counter(through, counter_model, counter_field, counter_column, other_column):
+    """
+    Maintains counter_model.counter_field = number of through rows of the object,
+    counter_column/other_column are the through table columns of both sides
+    """
+    def handler(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'pre_remove':
+            # pk_set of a removal may contain objects that are not related at all
+            column = other_column if not reverse else counter_column
+            instance._counter_removed = set(through.objects.filter(
+                **{(counter_column if not reverse else other_column): instance.pk, column + '__in': pk_set})
+                .values_list(column, flat=True))
+        elif action == 'pre_clear':
+            column = other_column if not reverse else counter_column
+            instance._counter_removed = set(through.objects.filter(
+                **{(counter_column if not reverse else other_column): instance.pk}).values_list(column, flat=True))
+        elif action in ('post_add', 'post_remove', 'post_clear'):
+            changed = pk_set if action == 'post_add' else instance.__dict__.pop('_counter_removed', set())
+            sign = 1 if action == 'post_add' else -1
+            if not reverse:
+                change_counter(counter_model, [instance.pk], counter_field, sign * len(changed))
+                # keep the instance in memory consistent, views serialize it right after add()
+                if isinstance(instance.__dict__.get(counter_field), int):
+                    setattr(instance, counter_field, instance.__dict__[counter_field] + sign * len(changed))
+            else:
+                change_counter(counter_model, changed, counter_field, sign)
+
+    m2m_changed.connect(handler, sender=through, weak=False,
+                        dispatch_uid='counter_%s_%s' % (through._meta.label_lower, counter_field))
+
+
+connect_m2m_counter(StudyGroup.students.through, StudyGroup, 'student_count', 'studygroup_id', 'user_id')
+connect_m2m_counter(StudyGroup.teachers.through, StudyGroup, 'teacher_count', 'studygroup_id', 'user_id')
+connect_m2m_counter(Lesson.attendances.through, Lesson, 'attendance_count', 'lesson_id', 'user_id')
+
+
+@receiver(post_save, sender=Lesson, dispatch_uid='counter_lesson_created')
+def lesson_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(StudyGroup, [instance.group_id], 'lesson_count', 1)
+
+
+@receiver(pre_delete, sender=StudyGroup, dispatch_uid='counter_group_deleting')
+def group_deleting(sender, instance, **kwargs):
+    # pre_delete of every collected object is sent before the first row is deleted,
+    # StudyGroup.delete() and its queryset's delete() forget the id again
+    deleting_groups().add(instance.pk)
+
+
+@receiver(post_delete, sender=Lesson, dispatch_uid='counter_lesson_deleted')
+def lesson_deleted(sender, instance, **kwargs):
+    if instance.group_id not in deleting_groups():
+        change_counter(StudyGroup, [instance.group_id], 'lesson_count', -1)
+
+
+@receiver(pre_delete, sender=User, dispatch_uid='counter_user_deleting')
+def user_deleting(sender, instance, **kwargs):
+    # the cascade fast-deletes memberships, attendances and marks without signals,
+    # a student has at most one mark per lesson
+    StudyGroup.all_objects.filter(students=instance).update(student_count=F('student_count') - 1)
+    StudyGroup.all_objects.filter(teachers=instance).update(teacher_count=F('teacher_count') - 1)
+    Lesson.all_objects.filter(attendances=instance).update(attendance_count=F('attendance_count') - 1)
+    marks = Mark.objects.filter(lesson_id=OuterRef('pk'), student_id=instance.pk)
+    Lesson.all_objects.filter(marks__student=instance) \
+        .update(mark_count=F('mark_count') - 1, mark_sum=F('mark_sum') - Subquery(marks.values('mark')[:1]))
+
+
+@receiver(post_init, sender=Mark, dispatch_uid='counter_mark_loaded')
+def mark_loaded(sender, instance, **kwargs):
+    # __dict__ avoids a query when the field is deferred
+    mark = instance.__dict__.get('mark')
+    instance._saved_mark = float(mark) if instance.pk and mark is not None else None
+
+
+@receiver(post_save, sender=Mark, dispatch_uid='counter_mark_saved')
+def mark_saved(sender, instance, created, **kwargs):
+    if created:
+        Lesson.all_objects.filter(pk=instance.lesson_id) \
+            .update(mark_count=F('mark_count') + 1, mark_sum=F('mark_sum') + float(instance.mark))
+    elif instance._saved_mark is not None:
+        change_counter(Lesson, [instance.lesson_id], 'mark_sum', float(instance.mark) - instance._saved_mark)
+    instance._saved_mark = float(instance.mark)
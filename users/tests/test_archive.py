@@ -0,0 +1,40 @@
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User, StudyGroup, Lesson, Mark
+
+
+class GroupArchiveTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher@example.com', 'Teacher', User.Role.TEACHER)
+        cls.student = User.objects.create_user('student@example.com', 'Student', User.Role.STUDENT)
+        cls.group = StudyGroup.objects.create(group_title='Group', subject_title='Subject')
+        cls.group.teachers.add(cls.teacher)
+        cls.group.students.add(cls.student)
+        cls.lesson = Lesson.objects.create(title='Lesson', group=cls.group)
+        cls.lesson.attendances.add(cls.student)
+        Mark.objects.create(student=cls.student, lesson=cls.lesson, mark=5)
+
+    def archive(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(self.teacher))
+        self.assertEqual(self.client.post('/api/v1/groups/%d/archive/' % self.group.id).status_code, 200)
+
+    def test_archived_lessons_are_hidden_from_marks_and_attendances(self):
+        path = '/api/v1/users/%d/' % self.student.id
+        response = self.client.get(path)
+        self.assertEqual((len(response.data['marks']), len(response.data['attendances'])), (1, 1))
+
+        self.archive()
+        response = self.client.get(path)
+        self.assertEqual((response.data['marks'], response.data['attendances']), ([], []))
+        response = self.client.patch(path, {'name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['marks'], response.data['attendances']), ([], []))
+
+    def test_archived_group_rejects_writes(self):
+        self.archive()
+        response = self.client.post('/api/v1/lessons/%d/marks/' % self.lesson.id,
+                                    {'student': self.student.id, 'mark': 3}, format='json')
+        self.assertIn(response.status_code, (403, 404))
+        self.assertEqual(Mark.objects.get().mark, 5)
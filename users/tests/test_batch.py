@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User, StudyGroup, Lesson, Mark
+from users.throttling import WriteRateThrottle
+
+
+class BatchTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher@example.com', 'Teacher', User.Role.TEACHER)
+        cls.student = User.objects.create_user('student@example.com', 'Student', User.Role.STUDENT)
+        cls.group = StudyGroup.objects.create(group_title='Group', subject_title='Subject')
+        cls.group.teachers.add(cls.teacher)
+        cls.group.students.add(cls.student)
+        cls.lesson = Lesson.objects.create(title='Lesson', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(self.teacher))
+
+    def batch(self, *operations):
+        return self.client.post('/api/v1/batch/', {'operations': list(operations)}, format='json')
+
+    def mark(self, value):
+        return {'method': 'POST', 'path': '/api/v1/lessons/%d/marks/' % self.lesson.id,
+                'body': {'student': self.student.id, 'mark': value}}
+
+    def test_references_to_earlier_responses(self):
+        response = self.batch({'method': 'POST', 'path': '/api/v1/groups/%d/lessons/' % self.group.id,
+                               'body': {'title': 'New'}},
+                              {'method': 'PUT', 'path': '/api/v1/lessons/{{0.id}}/',
+                               'body': {'title': 'Renamed {{0.title}}'}},
+                              {'method': 'POST', 'path': '/api/v1/lessons/{{0.id}}/marks/',
+                               'body': {'student': self.student.id, 'mark': 5}})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['committed'])
+        lesson = Lesson.objects.get(title='Renamed New')
+        self.assertEqual(response.data['responses'][2]['body']['lesson'], lesson.id)
+        self.assertEqual(lesson.marks.get().mark, 5)
+
+    def test_failed_operation_rolls_back_earlier_ones(self):
+        response = self.batch({'method': 'POST', 'path': '/api/v1/groups/%d/lessons/' % self.group.id,
+                               'body': {'title': 'New'}},
+                              self.mark(5),
+                              {'method': 'POST', 'path': '/api/v1/lessons/{{0.id}}/marks/',
+                               'body': {'mark': 5}},
+                              self.mark(4))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['committed'])
+        self.assertEqual([result['status'] for result in response.data['responses']], [200, 200, 404])
+        self.assertFalse(Lesson.objects.filter(title='New').exists())
+        self.assertFalse(Mark.objects.exists())
+
+    def test_nested_batches_and_non_api_paths_are_rejected(self):
+        for path in ('/api/v1/batch/', '/admin/', '/api-auth/login/'):
+            with self.subTest(path=path):
+                response = self.batch(self.mark(5), {'method': 'POST', 'path': path, 'body': {'operations': []}})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['responses'][1]['body']['error'], 'BatchError')
+                self.assertFalse(Mark.objects.exists())
+
+    def test_membership_is_checked_once_per_batch(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.batch(self.mark(5), self.mark(4), self.mark(3))
+        self.assertEqual(response.status_code, 200)
+        membership = [query for query in queries.captured_queries
+                      if 'users_studygroup_teachers' in query['sql']]
+        self.assertEqual(len(membership), 1)
+
+    @mock.patch.dict(WriteRateThrottle.THROTTLE_RATES, {'write': '5/min'})
+    def test_every_unsafe_operation_takes_a_write_token(self):
+        reads = [{'method': 'GET', 'path': '/api/v1/groups/'}] * 5
+        self.assertEqual(self.batch(*reads, *[self.mark(value) for value in range(1, 4)]).status_code, 200)
+        response = self.batch(self.mark(4), self.mark(5), self.mark(4))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Mark.objects.get().mark, 3)
+        self.assertEqual(self.batch(self.mark(4), self.mark(5)).status_code, 200)
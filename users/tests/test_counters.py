@@ -0,0 +1,101 @@
+import io
+
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models.signals import pre_delete
+from django.test import TestCase
+
+from users.counters import expected_counters, stale_rows
+from users.models import User, StudyGroup, Lesson, Mark, deleting_groups
+
+
+class CounterTest(TestCase):
+    """
+    Runs every path the signals of users.signals and MarkQuerySet.delete() count,
+    the counters have to match recompute_counters afterwards
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher@example.com', 'Teacher', User.Role.TEACHER)
+        cls.students = [User.objects.create_user('student%d@example.com' % i, 'Student %d' % i, User.Role.STUDENT)
+                        for i in range(3)]
+        cls.groups = [cls.create_group('Group %d' % i) for i in range(2)]
+
+    @classmethod
+    def create_group(cls, title):
+        group = StudyGroup.objects.create(group_title=title, subject_title='Subject')
+        group.teachers.add(cls.teacher)
+        group.students.add(*cls.students)
+        for day in range(3):
+            lesson = Lesson.objects.create(title='Lesson %d' % day, group=group)
+            lesson.attendances.add(*cls.students[:2])
+            for student in cls.students:
+                Mark.objects.create(student=student, lesson=lesson, mark=day + 2)
+        return group
+
+    def assertCountersFresh(self):
+        for model, counters in expected_counters().items():
+            self.assertEqual(list(stale_rows(model, counters).values_list('pk', flat=True)), [],
+                             '%s counters are stale' % model.__name__)
+        call_command('recompute_counters', verify=True, stdout=io.StringIO())
+
+    def test_created(self):
+        self.assertCountersFresh()
+        group = StudyGroup.objects.get(pk=self.groups[0].pk)
+        self.assertEqual((group.student_count, group.teacher_count, group.lesson_count), (3, 1, 3))
+
+    def test_m2m_changes_of_both_sides(self):
+        group, other = self.groups
+        lesson = group.lessons.first()
+        student = self.students[0]
+        group.students.remove(student, self.teacher)
+        other.teachers.clear()
+        student.studying_groups.add(group)
+        student.studying_groups.remove(other)
+        self.teacher.teaching_groups.clear()
+        lesson.attendances.clear()
+        student.attendances.set([lesson, other.lessons.first()])
+        self.students[2].attendances.add(*other.lessons.all())
+        self.assertCountersFresh()
+
+    def test_marks_updated_and_deleted(self):
+        lesson = self.groups[0].lessons.first()
+        mark = lesson.marks.first()
+        mark.mark = 10
+        mark.save()
+        Mark.objects.update_or_create(student=self.students[1], lesson=lesson, defaults={'mark': 1})
+        Mark.objects.get(student=self.students[2], lesson=lesson).delete()
+        Mark.objects.filter(lesson__group=self.groups[1]).delete()
+        self.assertCountersFresh()
+
+    def test_deletes(self):
+        self.groups[0].lessons.first().delete()
+        Lesson.objects.filter(group=self.groups[1])[:1].get().delete()
+        self.students[0].delete()
+        self.teacher.delete()
+        self.groups[1].delete()
+        self.assertCountersFresh()
+        StudyGroup.objects.all().delete()
+        self.assertCountersFresh()
+        self.assertEqual(deleting_groups(), set())
+
+    def test_failed_group_delete_is_forgotten(self):
+        group = self.groups[0]
+
+        def fail(sender, **kwargs):
+            raise RuntimeError('delete failed')
+
+        pre_delete.connect(fail, sender=StudyGroup)
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                group.delete()
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                StudyGroup.objects.filter(pk=group.pk).delete()
+        finally:
+            pre_delete.disconnect(fail, sender=StudyGroup)
+        self.assertEqual(deleting_groups(), set())
+
+        group.lessons.first().delete()
+        group.refresh_from_db()
+        self.assertEqual(group.lesson_count, 2)
+        self.assertCountersFresh()
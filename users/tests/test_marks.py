@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+import time
+
+from django.db import connection
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User, StudyGroup, Lesson, Mark
+from users.views import MarkList
+
+
+class MarkListTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher@example.com', 'Teacher', User.Role.TEACHER)
+        cls.student = User.objects.create_user('student@example.com', 'Student', User.Role.STUDENT)
+        group = StudyGroup.objects.create(group_title='Group', subject_title='Subject')
+        group.teachers.add(cls.teacher)
+        group.students.add(cls.student)
+        cls.lesson = Lesson.objects.create(title='Lesson', group=group)
+
+    def test_second_write_updates_the_mark(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(self.teacher))
+        path = '/api/v1/lessons/%d/marks/' % self.lesson.id
+        first = self.client.post(path, {'student': self.student.id, 'mark': 3}, format='json')
+        second = self.client.post(path, {'student': self.student.id, 'mark': 5}, format='json')
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(list(Mark.objects.values_list('student_id', 'lesson_id', 'mark')),
+                         [(self.student.id, self.lesson.id, 5)])
+        self.lesson.refresh_from_db()
+        self.assertEqual((self.lesson.mark_count, self.lesson.mark_sum), (1, 5))
+
+
+# SQLite serializes writers and fails concurrent upserts with "database is locked"
+# instead of racing them, the race only exists on backends with row locks (Postgres)
+@skipUnlessDBFeature('has_select_for_update')
+class MarkListConcurrencyTest(TransactionTestCase):
+    """
+    Hammers MarkList.post for one lesson from several threads, afterwards every student has to
+    have exactly one mark holding one of the written values. STRESS_MARKS_THREADS and
+    STRESS_MARKS_WRITES (per thread) scale the run, STRESS_MARKS_REPORT=1 prints writes/sec.
+    """
+    threads = int(os.environ.get('STRESS_MARKS_THREADS', 8))
+    writes = int(os.environ.get('STRESS_MARKS_WRITES', 50))
+    students = 5
+
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher@example.com', 'Teacher', User.Role.TEACHER)
+        self.student_list = [User.objects.create_user('student%d@example.com' % i, 'Student', User.Role.STUDENT)
+                             for i in range(self.students)]
+        group = StudyGroup.objects.create(group_title='Stress', subject_title='Stress test')
+        group.teachers.add(self.teacher)
+        group.students.add(*self.student_list)
+        self.lesson = Lesson.objects.create(title='Stress test', group=group)
+
+    def test_one_mark_per_student(self):
+        # throttling would reject most of the writes, the point is to race the upserts
+        view = MarkList.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        errors = list()
+        written = dict()
+        lock = threading.Lock()
+        start = threading.Barrier(self.threads)
+
+        def worker(number):
+            try:
+                start.wait()
+                for i in range(self.writes):
+                    student = self.student_list[i % len(self.student_list)]
+                    value = float(number * self.writes + i)
+                    request = factory.post('/api/v1/lessons/%d/marks/' % self.lesson.id,
+                                           {'student': student.id, 'mark': value}, format='json')
+                    force_authenticate(request, user=self.teacher)
+                    response = view(request, lesson_id=self.lesson.id)
+                    with lock:
+                        if response.status_code != 200:
+                            errors.append(response.status_code)
+                        else:
+                            written.setdefault(student.id, set()).add(value)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(self.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        total = self.threads * self.writes
+        if os.environ.get('STRESS_MARKS_REPORT') == '1':
+            sys.stderr.write('\n%d writes from %d threads in %.2fs: %.0f writes/sec, %d failed\n'
+                             % (total, self.threads, elapsed, (total - len(errors)) / elapsed, len(errors)))
+
+        self.assertEqual(errors, [])
+        marks = list(Mark.objects.filter(lesson=self.lesson).values_list('student_id', 'mark'))
+        for student in self.student_list:
+            values = [mark for student_id, mark in marks if student_id == student.id]
+            self.assertEqual(len(values), 1, 'student %d has %d marks' % (student.id, len(values)))
+            self.assertIn(values[0], written[student.id])
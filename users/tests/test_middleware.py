@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from users.middleware import CompressionMiddleware, ConcurrencyLimitMiddleware
+
+DEAD_WORKER = 999999
+
+
+@override_settings(MAX_CONCURRENT_REQUESTS=1, CONCURRENCY_COUNTER_TTL=60)
+class ConcurrencyLimitMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/api/v1/')
+
+    def test_requests_in_flight_take_slots(self):
+        nested = []
+
+        def view(request):
+            # arrives while the outer request holds the only slot
+            nested.append(middleware(request))
+            return HttpResponse()
+
+        middleware = ConcurrencyLimitMiddleware(view)
+        self.assertEqual(middleware(self.request).status_code, 200)
+        self.assertEqual(nested[0].status_code, 503)
+        self.assertEqual(nested[0]['Retry-After'], '1')
+        self.assertEqual(cache.get(ConcurrencyLimitMiddleware.key_format % os.getpid()), 0)
+
+    def test_slot_leaked_by_a_killed_worker_expires_under_traffic(self):
+        # the last write of a worker killed in the middle of a request
+        cache.set(ConcurrencyLimitMiddleware.registry_key, [DEAD_WORKER], None)
+        cache.set(ConcurrencyLimitMiddleware.key_format % DEAD_WORKER, 1, 0.3)
+        middleware = ConcurrencyLimitMiddleware(lambda request: HttpResponse())
+
+        self.assertEqual(middleware(self.request).status_code, 503)
+        deadline = time.monotonic() + 2
+        while middleware(self.request).status_code == 503:
+            self.assertLess(time.monotonic(), deadline, 'the leaked slot never expired')
+            time.sleep(0.05)
+        self.assertEqual(cache.get(ConcurrencyLimitMiddleware.registry_key), [os.getpid()])
+
+
+@override_settings(COMPRESS_ENCODINGS=['gzip'], COMPRESS_MIN_SIZE=10)
+class CompressionMiddlewareTest(SimpleTestCase):
+    def compress(self, content_type):
+        response = HttpResponse('{"name": "value"}' * 100, content_type=content_type)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_api_responses_are_compressed(self):
+        for content_type in ('application/json', 'text/calendar; charset=utf-8'):
+            with self.subTest(content_type=content_type):
+                self.assertEqual(self.compress(content_type)['Content-Encoding'], 'gzip')
+
+    def test_html_pages_are_not_compressed(self):
+        self.assertFalse(self.compress('text/html; charset=utf-8').has_header('Content-Encoding'))
@@ -0,0 +1,150 @@
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.urls import URLPattern, URLResolver, resolve
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from users import urls
+from users.models import User, StudyGroup, Lesson, Mark, RequestProfile
+
+API_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+
+def join_route(prefix, route):
+    return prefix + (route[1:] if route.startswith('^') else route)
+
+
+def api_routes(patterns, prefix='api/v1/'):
+    """
+    (route, method) of every endpoint, as resolve().route spells the route
+    """
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from api_routes(pattern.url_patterns, join_route(prefix, str(pattern.pattern)))
+        elif isinstance(pattern, URLPattern) and '(?P<format>' not in str(pattern.pattern):
+            actions = getattr(pattern.callback, 'actions', None)
+            view_class = pattern.callback.cls
+            # viewsets add 'head' to their actions once they served a request
+            methods = [method for method in API_METHODS
+                       if (method in actions if actions else hasattr(view_class, method))]
+            for method in methods:
+                yield join_route(prefix, str(pattern.pattern)), method
+
+
+class QueryBudgetTest(APITestCase):
+    """
+    Every route of users/urls.py in 'raise' mode. Groups have several students and lessons with
+    marks and attendances, so a query per row exceeds the constant budgets.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher@example.com', 'Teacher', User.Role.TEACHER, 'password')
+        cls.students = [User.objects.create_user('student%d@example.com' % i, 'Student %d' % i, User.Role.STUDENT,
+                                                 'password')
+                        for i in range(5)]
+        cls.new_student = User.objects.create_user('new.student@example.com', 'New', User.Role.STUDENT)
+        cls.new_teacher = User.objects.create_user('new.teacher@example.com', 'New', User.Role.TEACHER)
+        cls.spare_user = User.objects.create_user('spare@example.com', 'Spare', User.Role.STUDENT)
+        cls.admin = User.objects.create_superuser('admin@example.com', 'Admin', User.Role.TEACHER, 'password')
+
+        cls.group = cls.create_group('Group')
+        cls.lessons = list(cls.group.lessons.order_by('id'))
+        cls.archived_group = cls.create_group('Archived')
+        cls.deleted_group = cls.create_group('Deleted')
+        cls.profile = RequestProfile.objects.create(user=cls.admin, method='GET', path='/api/v1/groups/',
+                                                    status_code=200, duration=1.0, mode='sample', data=b'{}')
+
+    @classmethod
+    def create_group(cls, title):
+        group = StudyGroup.objects.create(group_title=title, subject_title='Subject')
+        group.teachers.add(cls.teacher)
+        group.students.add(*cls.students)
+        for day in range(1, 5):
+            lesson = Lesson.objects.create(title='Lesson %d' % day, group=group,
+                                           date=datetime(2022, 9, day, 10, tzinfo=timezone.utc))
+            lesson.attendances.add(*cls.students)
+            for student in cls.students:
+                Mark.objects.create(student=student, lesson=lesson, mark=day)
+        return group
+
+    def setUp(self):
+        # throttle buckets live in the cache
+        cache.clear()
+
+    def requests(self):
+        """
+        (user, method, path, data, expected status), in order: later requests delete data
+        """
+        group, lesson, student = self.group.id, self.lessons[0].id, self.students[0]
+        return [
+            (self.teacher, 'get', '/api/v1/', None, 200),
+            (None, 'get', '/api/v1/users/', None, 200),
+            (None, 'post', '/api/v1/users/', {'email': 'created@example.com', 'name': 'Created', 'role': 'ST',
+                                              'marks': [], 'attendances': []}, 201),
+            (None, 'get', '/api/v1/users/%d/' % student.id, None, 200),
+            (None, 'put', '/api/v1/users/%d/' % self.spare_user.id,
+             {'email': 'spare@example.com', 'name': 'Spare', 'role': 'ST', 'marks': [], 'attendances': []}, 200),
+            (None, 'patch', '/api/v1/users/%d/' % self.spare_user.id, {'name': 'Patched'}, 200),
+            (None, 'delete', '/api/v1/users/%d/' % self.spare_user.id, None, 204),
+            (None, 'post', '/api/v1/registration/', {'email': 'registered@example.com', 'name': 'Registered',
+                                                     'role': 'ST', 'password': 'password'}, 200),
+            (None, 'post', '/api/v1/login/', {'email': 'teacher@example.com', 'password': 'password'}, 200),
+            (None, 'post', '/api/v1/refresh-token/', {'refresh': str(RefreshToken.for_user(self.teacher))}, 200),
+            (None, 'post', '/api/v1/verify-token/', {'token': str(AccessToken.for_user(self.teacher))}, 200),
+            (self.teacher, 'get', '/api/v1/me/', None, 200),
+            (self.teacher, 'put', '/api/v1/me/', {'name': 'Teacher'}, 200),
+            (student, 'get', '/api/v1/me/schedule/', None, 200),
+            (student, 'get', '/api/v1/me/schedule.ics', None, 200),
+            (self.teacher, 'get', '/api/v1/search/?q=stu', None, 200),
+            (self.admin, 'get', '/api/v1/profiles/', None, 200),
+            (self.admin, 'get', '/api/v1/profiles/%d/' % self.profile.id, None, 200),
+            (self.admin, 'get', '/api/v1/profiles/%d/download/' % self.profile.id, None, 200),
+            (self.teacher, 'get', '/api/v1/groups/', None, 200),
+            (student, 'get', '/api/v1/groups/', None, 200),
+            (self.teacher, 'post', '/api/v1/groups/', {'group_title': 'New', 'subject_title': 'Subject'}, 200),
+            (self.teacher, 'put', '/api/v1/groups/%d/' % group, {'group_title': 'Renamed'}, 200),
+            (self.teacher, 'post', '/api/v1/groups/%d/students/' % group, {'email': self.new_student.email}, 200),
+            (self.teacher, 'post', '/api/v1/groups/%d/teachers/' % group, {'email': self.new_teacher.email}, 200),
+            (self.teacher, 'get', '/api/v1/groups/%d/lessons/' % group, None, 200),
+            (student, 'get', '/api/v1/groups/%d/lessons/' % group, None, 200),
+            (self.teacher, 'post', '/api/v1/groups/%d/lessons/' % group, {'title': 'New'}, 200),
+            (self.teacher, 'get', '/api/v1/groups/%d/student_progress/?email=%s' % (group, student.email), None,
+             200),
+            (self.teacher, 'put', '/api/v1/lessons/%d/' % lesson, {'title': 'Renamed'}, 200),
+            (self.teacher, 'get', '/api/v1/lessons/%d/students/' % lesson, None, 200),
+            (self.teacher, 'post', '/api/v1/lessons/%d/marks/' % lesson, {'student': student.id, 'mark': 5}, 200),
+            (self.teacher, 'delete', '/api/v1/lessons/%d/marks/' % lesson, {'student': student.id}, 200),
+            (self.teacher, 'post', '/api/v1/lessons/%d/attendances/' % lesson,
+             {'student': student.id, 'attendance': False}, 200),
+            (self.teacher, 'post', '/api/v1/batch/', {'operations': [
+                {'method': 'POST', 'path': '/api/v1/groups/%d/lessons/' % group, 'body': {'title': 'Batch'}},
+                {'method': 'PUT', 'path': '/api/v1/lessons/{{0.id}}/', 'body': {'title': 'Batched'}},
+                {'method': 'POST', 'path': '/api/v1/lessons/{{0.id}}/marks/',
+                 'body': {'student': student.id, 'mark': 4}},
+            ]}, 200),
+            (self.teacher, 'post', '/api/v1/groups/%d/archive/' % self.archived_group.id, None, 200),
+            (self.teacher, 'delete', '/api/v1/lessons/%d/' % self.lessons[1].id, None, 200),
+            (self.teacher, 'delete', '/api/v1/groups/%d/' % self.deleted_group.id, None, 200),
+        ]
+
+    def test_routes_stay_within_budget(self):
+        for user, method, path, data, expected in self.requests():
+            with self.subTest(method=method, path=path):
+                if user is not None:
+                    self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(user))
+                else:
+                    self.client.credentials()
+                response = getattr(self.client, method)(path, data, format='json')
+                self.assertEqual(response.status_code, expected, getattr(response, 'data', None))
+
+    def test_every_route_is_requested(self):
+        requested = {(resolve(path.split('?')[0]).route, method) for _, method, path, _, _ in self.requests()}
+        self.assertEqual(set(api_routes(urls.urlpatterns)) - requested, set())
+
+    def test_student_lessons_carry_attendance_and_mark(self):
+        student = self.students[1]
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(student))
+        response = self.client.get('/api/v1/groups/%d/lessons/' % self.group.id)
+        self.assertEqual([(item['attendance'], item['mark']) for item in response.data],
+                         [(True, lesson.marks.get(student=student).mark) for lesson in self.lessons])
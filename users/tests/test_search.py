@@ -0,0 +1,18 @@
+from django.test import TestCase
+
+from users.models import User, StudyGroup
+from users.search import search_groups
+
+
+class SearchGroupsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user('user%d@example.com' % i, 'User %d' % i, User.Role.TEACHER)
+                     for i in range(3)]
+        cls.group = StudyGroup.objects.create(group_title='Algebra', subject_title='Math')
+        cls.group.students.add(*cls.users)
+        cls.group.teachers.add(*cls.users)
+        StudyGroup.objects.create(group_title='Algebra', subject_title='Math')
+
+    def test_groups_of_the_user_once(self):
+        self.assertEqual(list(search_groups(self.users[0], 'alg')), [self.group])
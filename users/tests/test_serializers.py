@@ -0,0 +1,20 @@
+from rest_framework.test import APITestCase
+
+from users.models import User
+
+
+class SelectableFieldsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student@example.com', 'Student', User.Role.STUDENT)
+
+    def test_reads_return_only_selected_fields(self):
+        response = self.client.get('/api/v1/users/?fields=name,marks&include=attendances')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{'id': self.user.id, 'name': 'Student'}])
+
+    def test_writes_validate_every_field(self):
+        response = self.client.post('/api/v1/users/?fields=id', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertLessEqual({'email', 'name', 'role'}, set(response.data))
+        self.assertEqual(User.objects.count(), 1)
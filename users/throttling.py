@@ -0,0 +1,109 @@
+import time
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket over the shared cache: rate '10/min' means a burst of 10 requests,
+    refilled at 10 tokens per minute. Bucket state is stored as (tokens, timestamp), a request
+    takes get_cost() tokens.
+    The read-modify-write runs under a per-bucket lock taken with cache.add(), which is
+    atomic in every backend, so concurrent requests cannot overdraw the bucket. A request
+    that cannot take the lock within lock_attempts tries is throttled.
+    """
+    lock_timeout = 1
+    lock_attempts = 20
+    lock_wait = 0.005
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.cost = self.get_cost(request, view)
+        lock = self.key + ':lock'
+        if not self.acquire(lock):
+            self.tokens = 0
+            return self.throttle_failure()
+        try:
+            self.now = self.timer()
+            tokens, updated = self.cache.get(self.key, (float(self.num_requests), self.now))
+            tokens = min(float(self.num_requests), tokens + (self.now - updated) * self.num_requests / self.duration)
+            if tokens < self.cost:
+                self.tokens = tokens
+                return self.throttle_failure()
+            self.tokens = tokens - self.cost
+            self.cache.set(self.key, (self.tokens, self.now), self.duration)
+            return self.throttle_success()
+        finally:
+            self.cache.delete(lock)
+
+    def get_cost(self, request, view):
+        return 1
+
+    def acquire(self, lock):
+        for _ in range(self.lock_attempts):
+            if self.cache.add(lock, 1, self.lock_timeout):
+                return True
+            time.sleep(self.lock_wait)
+        return False
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        return (self.cost - self.tokens) * self.duration / self.num_requests
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Limits requests per client IP, used for unauthenticated endpoints
+    """
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request)
+        }
+
+
+class LoginRateThrottle(IPTokenBucketThrottle):
+    scope = 'login'
+
+
+class RegistrationRateThrottle(IPTokenBucketThrottle):
+    scope = 'registration'
+
+
+class UserListRateThrottle(IPTokenBucketThrottle):
+    scope = 'user_list'
+
+
+class WriteRateThrottle(TokenBucketThrottle):
+    """
+    Limits unsafe requests per authenticated user (per IP for anonymous ones). A view may charge
+    more than one token with get_throttle_cost(request): a batch takes one per unsafe operation
+    up front and its sub-requests are not charged again
+    """
+    scope = 'write'
+
+    def get_cache_key(self, request, view):
+        if request.method in SAFE_METHODS or getattr(request, 'batched', False):
+            return None
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': ident
+        }
+
+    def get_cost(self, request, view):
+        if hasattr(view, 'get_throttle_cost'):
+            return view.get_throttle_cost(request)
+        return 1
@@ -2,13 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from . import views
-from rest_framework_simplejwt.views import (
-    TokenRefreshView,
-    TokenVerifyView,
-)
 
 
 router = DefaultRouter()
+router.APIRootView = views.APIRoot
 router.register('users', views.UserViewSet)
 
 urlpatterns = [
@@ -16,11 +13,19 @@ urlpatterns = [
 
     path('registration/', views.UserRegistration.as_view()),
     path('login/', views.UserAuthentication.as_view(), name='token_obtain_pair'),
-    path('refresh-token/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('verify-token/', TokenVerifyView.as_view(), name='token_verify'),
+    path('refresh-token/', views.TokenRefresh.as_view(), name='token_refresh'),
+    path('verify-token/', views.TokenVerify.as_view(), name='token_verify'),
     path('me/', views.CurrentUserView.as_view()),
+    path('me/schedule/', views.Schedule.as_view()),
+    path('me/schedule.ics', views.ScheduleCalendar.as_view()),
+    path('batch/', views.Batch.as_view()),
+    path('search/', views.Search.as_view()),
+    path('profiles/', views.ProfileList.as_view()),
+    path('profiles/<int:profile_id>/', views.ProfileDetail.as_view()),
+    path('profiles/<int:profile_id>/download/', views.ProfileDownload.as_view()),
     path('groups/', views.GroupList.as_view()),
     path('groups/<int:pk>/', views.GroupDetail.as_view()),
+    path('groups/<int:pk>/archive/', views.GroupArchive.as_view()),
     path('groups/<int:group_id>/students/', views.AddStudent.as_view()),
     path('groups/<int:group_id>/teachers/', views.AddTeacher.as_view()),
     path('groups/<int:group_id>/lessons/', views.LessonList.as_view()),
@@ -1,39 +1,193 @@
-from rest_framework import viewsets
+from rest_framework import routers, viewsets
 from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery, prefetch_related_objects
+from django.http import HttpResponse
 from django.utils.dateparse import parse_datetime
-from users.models import User, StudyGroup, Lesson, Mark
+from users.batch import BatchError, dispatch
+from users.calendar import lessons_to_ical, parse_date_range
+from users.profiling import stats_summary
+from users.query_budget import per_item
+from users.models import User, StudyGroup, Lesson, Mark, RequestProfile
+from users.renderers import is_normalized
+from users.search import search_users, search_groups, SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT
+from users.throttling import LoginRateThrottle, RegistrationRateThrottle, UserListRateThrottle, \
+    WriteRateThrottle
 from users.serializers import UserSerializer, StudyGroupSerializer, LessonSerializer, StudentLessonSerializer, \
-    MarkSerializer, SimpleUserSerializer
+    MarkSerializer, SimpleUserSerializer, ScheduleLessonSerializer, SimpleStudyGroupSerializer, EntityStore, \
+    RequestProfileSerializer
 
 
-class UserViewSet(viewsets.ModelViewSet):
+def filter_by_date_range(lessons, date_from, date_to):
+    if date_from is not None:
+        lessons = lessons.filter(date__gte=date_from)
+    if date_to is not None:
+        lessons = lessons.filter(date__lt=date_to)
+    return lessons
+
+
+def with_student_results(lessons, student_id):
+    """
+    Annotates lessons with attendance and mark of one student, computed in the lessons query
+    """
+    return lessons.annotate(
+        attendance=Exists(Lesson.attendances.through.objects.filter(lesson_id=OuterRef('pk'), user_id=student_id)),
+        mark=Subquery(Mark.objects.filter(lesson_id=OuterRef('pk'), student_id=student_id).values('mark')[:1]))
+
+
+def membership_cache(request):
+    """
+    Membership checks of request.user cached on the HttpRequest, Batch shares one cache between sub-requests
+    """
+    http_request = getattr(request, '_request', request)
+    if not hasattr(http_request, 'membership_cache'):
+        http_request.membership_cache = dict()
+    return http_request.membership_cache
+
+
+def is_member(request, group_id, relation):
+    """
+    Membership in a group that is not archived, archived groups are read-only for everyone
+    """
+    cache = membership_cache(request)
+    key = (relation, int(group_id))
+    if key not in cache:
+        cache[key] = getattr(StudyGroup, relation).through.objects \
+            .filter(studygroup_id=group_id, user_id=request.user.id, studygroup__archived=False).exists()
+    return cache[key]
+
+
+def is_teacher(request, group_id):
+    return is_member(request, group_id, 'teachers')
+
+
+def is_student(request, group_id):
+    return is_member(request, group_id, 'students')
+
+
+class NormalizedResponseMixin:
+    """
+    With ?format=normalized serializers built with get_serializer_context() put entities
+    into a shared EntityStore, finalize_response() emits them as top-level maps
+    """
+    entities = None
+
+    def get_serializer_context(self):
+        context = {'request': self.request, 'format': self.format_kwarg, 'view': self}
+        if is_normalized(self.request):
+            if self.entities is None:
+                self.entities = EntityStore()
+            context['entities'] = self.entities
+        return context
+
+    def normalize(self, entity_type, data):
+        """
+        Stores a hand-built representation, returns its id in normalized mode and the data otherwise
+        """
+        store = self.get_serializer_context().get('entities')
+        if store is None:
+            return data
+        return store.add(entity_type, data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.entities is not None and isinstance(response, Response) and response.status_code < 400:
+            response.data = self.entities.wrap(response.data)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class APIRoot(routers.APIRootView):
+    query_budget = 1
+
+
+class UserViewSet(NormalizedResponseMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
     """
     queryset = User.objects.all().order_by('email')
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [UserListRateThrottle, WriteRateThrottle]
+    # deleting cascades to a fixed set of tables and adjusts the counters of the user's groups and lessons
+    query_budget = {'delete': 22, 'default': 15}
+
+    def get_queryset(self):
+        return super().get_queryset().prefetch_related(*UserSerializer.get_prefetches(self.request))
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.reload(serializer)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.reload(serializer)
+
+    def reload(self, serializer):
+        # the response is rendered with the prefetches of get_queryset(), which leave out the marks of archived
+        # lessons, rather than from the saved instance whose related managers would load every mark
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+
+
+class Search(APIView):
+    query_budget = 4
+
+    def get(self, request):
+        """
+        Prefix search over users (email, name) and the current user's groups (group_title, subject_title)
+        Parameters: q (required), type=users|groups (default both), limit
+        """
+        query = request.GET.get('q', '').strip()
+        search_type = request.GET.get('type')
+        if not query or search_type not in (None, 'users', 'groups'):
+            return Response(data={'q': 'required', 'type': 'users or groups'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT)), 1), SEARCH_MAX_LIMIT)
+        except ValueError:
+            return Response(data={'limit': 'integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = dict()
+        if search_type in (None, 'users'):
+            data['users'] = SimpleUserSerializer(search_users(query, limit), many=True,
+                                                 context={'request': request}).data
+        if search_type in (None, 'groups'):
+            data['groups'] = SimpleStudyGroupSerializer(search_groups(request.user, query, limit), many=True,
+                                                        context={'request': request}).data
+        return Response(data=data)
+
+
+class TokenRefresh(TokenRefreshView):
+    query_budget = 2
+
+
+class TokenVerify(TokenVerifyView):
+    query_budget = 2
 
 
 class UserAuthentication(TokenObtainPairView):
+    throttle_classes = [LoginRateThrottle]
+    query_budget = 12
+
     def post(self, request, *args, **kwargs):
         """
         Authentication for users
         """
         response = super().post(request, *args, **kwargs)
         if 200 <= response.status_code <= 299:
-            user = User.objects.get(email=request.data['email'])
+            user = User.objects.prefetch_related(*UserSerializer.get_prefetches()).get(email=request.data['email'])
             response.data |= UserSerializer(user).data
         return response
 
 
 class UserRegistration(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [RegistrationRateThrottle]
+    query_budget = 8
 
     def post(self, request):
         """
@@ -56,12 +210,15 @@ class UserRegistration(APIView):
                             status=status.HTTP_400_BAD_REQUEST)
 
 
-class CurrentUserView(APIView):
+class CurrentUserView(NormalizedResponseMixin, APIView):
+    query_budget = 12
+
     def get(self, request):
         """
         Current user info by access token
         """
-        return Response(data=UserSerializer(request.user).data)
+        prefetch_related_objects([request.user], *UserSerializer.get_prefetches(request))
+        return Response(data=UserSerializer(request.user, context=self.get_serializer_context()).data)
 
     def put(self, request):
         """
@@ -75,43 +232,51 @@ class CurrentUserView(APIView):
         request.user.update_data(name=request.data['name'],
                                  role=request.data['role'],
                                  password=request.data['password'])
+        prefetch_related_objects([request.user], *UserSerializer.get_prefetches())
         return Response(data=(dict(UserSerializer(request.user).data) | ({'password': request.data['password']} if
                                                                          request.data['password'] else {})))
 
 
-class GroupList(APIView):
+class GroupList(NormalizedResponseMixin, APIView):
+    query_budget = {'get': 6, 'post': 12}
+
     def get(self, request):
+        prefetches = StudyGroupSerializer.get_prefetches(request)
         if request.user.role == User.Role.STUDENT:
-            return Response(data=StudyGroupSerializer(request.user.studying_groups, many=True).data)
+            return Response(data=StudyGroupSerializer(request.user.studying_groups.prefetch_related(*prefetches),
+                                                      many=True, context=self.get_serializer_context()).data)
         elif request.user.role == User.Role.TEACHER:
-            return Response(data=StudyGroupSerializer(request.user.teaching_groups, many=True).data)
+            return Response(data=StudyGroupSerializer(request.user.teaching_groups.prefetch_related(*prefetches),
+                                                      many=True, context=self.get_serializer_context()).data)
         else:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
     def post(self, request):
         try:
-            group = StudyGroup(group_title=request.data['group_title'],
-                               subject_title=request.data['subject_title'])
-            group.save()
-            group.teachers.add(request.user)
-            group.save()
-            return Response(data=StudyGroupSerializer(group).data)
+            with transaction.atomic():
+                group = StudyGroup.objects.create(group_title=request.data['group_title'],
+                                                  subject_title=request.data['subject_title'])
+                group.teachers.add(request.user)
+            membership_cache(request)[('teachers', group.id)] = True
+            return Response(data=StudyGroupSerializer(group, context=self.get_serializer_context()).data)
         except Exception:
             return Response(data={'group_title': 'required', 'subject_title': 'required'},
                             status=status.HTTP_400_BAD_REQUEST)
 
 
-class GroupDetail(APIView):
+class GroupDetail(NormalizedResponseMixin, APIView):
+    query_budget = {'put': 10, 'delete': 16}
+
     def put(self, request, pk):
         try:
             group = StudyGroup.objects.get(id=pk)
-            if group.teachers.filter(id=request.user.id).exists():
+            if is_teacher(request, group.id):
                 if 'group_title' in request.data:
                     group.group_title = request.data['group_title']
                 if 'subject_title' in request.data:
                     group.subject_title = request.data['subject_title']
                 group.save()
-                return Response(data=StudyGroupSerializer(group).data)
+                return Response(data=StudyGroupSerializer(group, context=self.get_serializer_context()).data)
             else:
                 return Response(status=status.HTTP_404_NOT_FOUND)
         except Exception:
@@ -120,8 +285,10 @@ class GroupDetail(APIView):
     def delete(self, request, pk):
         try:
             group = StudyGroup.objects.get(id=pk)
-            if group.teachers.filter(id=request.user.id).exists():
+            if is_teacher(request, group.id):
                 group.delete()
+                membership_cache(request).pop(('teachers', int(pk)), None)
+                membership_cache(request).pop(('students', int(pk)), None)
                 return Response(status=status.HTTP_200_OK)
             else:
                 return Response(status=status.HTTP_404_NOT_FOUND)
@@ -129,24 +296,52 @@ class GroupDetail(APIView):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-class LessonList(APIView):
+class GroupArchive(APIView):
+    query_budget = 8
+
+    def post(self, request, pk):
+        """
+        Archives the group with its lessons, they disappear from every default queryset
+        """
+        if not is_teacher(request, pk):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        try:
+            group = StudyGroup.objects.get(id=pk)
+        except StudyGroup.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        with transaction.atomic():
+            group.archive()
+        membership_cache(request).pop(('teachers', group.id), None)
+        membership_cache(request).pop(('students', group.id), None)
+        return Response(status=status.HTTP_200_OK)
+
+
+class LessonList(NormalizedResponseMixin, APIView):
+    query_budget = {'get': 9, 'post': 8}
+
     def get(self, request, group_id):
+        """
+        Lessons of the group, optionally limited to ?from=&to= (to is exclusive)
+        """
+        try:
+            date_from, date_to = parse_date_range(request.GET)
+        except ValueError as e:
+            return Response(data={'error': type(e).__name__, 'message': str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
         try:
             group = StudyGroup.objects.get(id=group_id)
+            lessons = filter_by_date_range(group.lessons.all(), date_from, date_to)
 
-            if group.teachers.filter(id=request.user.id).exists():
-                return Response(data=list(LessonSerializer(lesson).data for lesson in group.lessons.all()))
+            if is_teacher(request, group.id):
+                lessons = lessons.prefetch_related(*LessonSerializer.get_prefetches(request))
+                return Response(data=LessonSerializer(lessons, many=True, context=self.get_serializer_context()).data)
 
-            if group.students.filter(id=request.user.id).exists():
+            if is_student(request, group.id):
                 data = list()
-                for lesson in group.lessons.all():
-                    item = StudentLessonSerializer(lesson).data
-                    item |= {'attendance': lesson.attendances.filter(id=request.user.id).exists()}
-                    try:
-                        item |= {'mark': lesson.marks.filter(student_id=request.user.id).get().mark}
-                    except Mark.DoesNotExist:
-                        item |= {'mark': None}
-                    data.append(item)
+                for lesson in with_student_results(lessons, request.user.id):
+                    item = StudentLessonSerializer(lesson, context={'request': request}).data
+                    item |= {'attendance': lesson.attendance, 'mark': lesson.mark}
+                    data.append(self.normalize('lessons', item))
                 return Response(data=data)
 
             return Response(status=status.HTTP_404_NOT_FOUND)
@@ -155,29 +350,76 @@ class LessonList(APIView):
 
     def post(self, request, group_id):
         try:
-            if StudyGroup.objects.get(id=group_id).teachers.filter(id=request.user.id).exists():
+            if is_teacher(request, group_id):
                 lesson = Lesson(title=request.data['title'],
                                 date=parse_datetime(request.data['date']) if 'date' in request.data else None,
                                 group_id=group_id)
                 lesson.save()
-                return Response(data=LessonSerializer(lesson).data)
+                return Response(data=LessonSerializer(lesson, context=self.get_serializer_context()).data)
             else:
                 return Response(status=status.HTTP_404_NOT_FOUND)
         except Exception:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-class LessonDetail(APIView):
+class ScheduleMixin:
+    def get_schedule(self, request):
+        """
+        Dated lessons of every group the user studies or teaches in, in a single query
+        """
+        date_from, date_to = parse_date_range(request.GET)
+        # a group id subquery keeps (group, date) index driving the query
+        lessons = Lesson.objects.filter(group_id__in=request.user.group_ids(), date__isnull=False)
+        return filter_by_date_range(lessons, date_from, date_to).select_related('group').order_by('date', 'id')
+
+
+class Schedule(ScheduleMixin, APIView):
+    query_budget = 3
+
+    def get(self, request):
+        """
+        Current user's schedule, optionally limited to ?from=&to= (to is exclusive)
+        """
+        try:
+            lessons = self.get_schedule(request)
+        except ValueError as e:
+            return Response(data={'error': type(e).__name__, 'message': str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(data=ScheduleLessonSerializer(lessons, many=True, context={'request': request}).data)
+
+
+class ScheduleCalendar(ScheduleMixin, APIView):
+    query_budget = 3
+
+    def get(self, request):
+        """
+        Current user's schedule as an iCalendar feed, accepts the same ?from=&to= as Schedule
+        """
+        try:
+            lessons = self.get_schedule(request)
+        except ValueError as e:
+            return Response(data={'error': type(e).__name__, 'message': str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        response = HttpResponse(lessons_to_ical(lessons, host=request.get_host()),
+                                content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="schedule.ics"'
+        return response
+
+
+class LessonDetail(NormalizedResponseMixin, APIView):
+    query_budget = {'put': 9, 'delete': 12}
+
     def put(self, request, lesson_id):
         try:
             lesson = Lesson.objects.get(id=lesson_id)
-            if lesson.group.teachers.filter(id=request.user.id).exists():
+            if is_teacher(request, lesson.group_id):
                 if 'title' in request.data:
                     lesson.title = request.data['title']
                 if 'date' in request.data:
                     lesson.date = parse_datetime(request.data['date'])
                 lesson.save()
-                return Response(data=LessonSerializer(lesson).data)
+                prefetch_related_objects([lesson], *LessonSerializer.get_prefetches(request))
+                return Response(data=LessonSerializer(lesson, context=self.get_serializer_context()).data)
             else:
                 return Response(status=status.HTTP_403_FORBIDDEN)
         except Exception as e:
@@ -187,7 +429,7 @@ class LessonDetail(APIView):
     def delete(self, request, lesson_id):
         try:
             lesson = Lesson.objects.get(id=lesson_id)
-            if lesson.group.teachers.filter(id=request.user.id).exists():
+            if is_teacher(request, lesson.group_id):
                 lesson.delete()
                 return Response(status=status.HTTP_200_OK)
             else:
@@ -196,20 +438,18 @@ class LessonDetail(APIView):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-class MarkList(APIView):
+class MarkList(NormalizedResponseMixin, APIView):
+    query_budget = {'post': 12, 'delete': 10}
+
     def post(self, request, lesson_id):
         try:
             lesson = Lesson.objects.get(id=lesson_id)
-            if lesson.group.teachers.filter(id=request.user.id).exists():
-                try:
-                    mark = lesson.marks.filter(student_id=request.data['student']).get()
-                    mark.mark = request.data['mark']
-                except Mark.DoesNotExist:
-                    mark = Mark(student_id=request.data['student'],
-                                lesson_id=lesson_id,
-                                mark=request.data['mark'])
-                mark.save()
-                return Response(data=MarkSerializer(mark).data)
+            if is_teacher(request, lesson.group_id):
+                # atomic upsert, the unique (student, lesson) constraint resolves concurrent creates
+                mark, _ = Mark.objects.update_or_create(student_id=request.data['student'],
+                                                        lesson_id=lesson.id,
+                                                        defaults={'mark': request.data['mark']})
+                return Response(data=MarkSerializer(mark, context=self.get_serializer_context()).data)
             else:
                 return Response(status=status.HTTP_403_FORBIDDEN)
         except Exception:
@@ -218,7 +458,7 @@ class MarkList(APIView):
     def delete(self, request, lesson_id):
         try:
             lesson = Lesson.objects.get(id=lesson_id)
-            if lesson.group.teachers.filter(id=request.user.id).exists():
+            if is_teacher(request, lesson.group_id):
                 lesson.marks.filter(student_id=request.data['student']).delete()
                 return Response(status=status.HTTP_200_OK)
             else:
@@ -228,10 +468,12 @@ class MarkList(APIView):
 
 
 class AttendanceList(APIView):
+    query_budget = 10
+
     def post(self, request, lesson_id):
         try:
             lesson = Lesson.objects.get(id=lesson_id)
-            if lesson.group.teachers.filter(id=request.user.id).exists():
+            if is_teacher(request, lesson.group_id):
                 if request.data['attendance']:
                     lesson.attendances.add(User.objects.get(id=request.data['student']))
                 else:
@@ -243,19 +485,21 @@ class AttendanceList(APIView):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-class AddStudent(APIView):
+class AddStudent(NormalizedResponseMixin, APIView):
+    query_budget = 14
+
     def post(self, request, group_id):
         try:
             group = StudyGroup.objects.get(id=group_id)
-            if not User.objects.filter(email=request.data['email']).exists():
+            try:
+                student = User.objects.get(email=request.data['email'])
+            except User.DoesNotExist:
                 return Response(status=status.HTTP_403_FORBIDDEN)
-            student = User.objects.get(email=request.data['email'])
 
             if not group.students.filter(id=student.id).exists() \
-                    and group.teachers.filter(id=request.user.id).exists():
+                    and is_teacher(request, group.id):
                 group.students.add(student)
-                group.save()
-                return Response(data=StudyGroupSerializer(group).data,
+                return Response(data=StudyGroupSerializer(group, context=self.get_serializer_context()).data,
                                 status=status.HTTP_200_OK)
             else:
                 return Response(status=status.HTTP_404_NOT_FOUND)
@@ -263,19 +507,21 @@ class AddStudent(APIView):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-class AddTeacher(APIView):
+class AddTeacher(NormalizedResponseMixin, APIView):
+    query_budget = 14
+
     def post(self, request, group_id):
         try:
             group = StudyGroup.objects.get(id=group_id)
-            if not User.objects.filter(email=request.data['email']).exists():
+            try:
+                teacher = User.objects.get(email=request.data['email'])
+            except User.DoesNotExist:
                 return Response(status=status.HTTP_403_FORBIDDEN)
-            teacher = User.objects.get(email=request.data['email'])
 
             if not group.teachers.filter(id=teacher.id).exists() \
-                    and group.teachers.filter(id=request.user.id).exists():
+                    and is_teacher(request, group.id):
                 group.teachers.add(teacher)
-                group.save()
-                return Response(data=StudyGroupSerializer(group).data,
+                return Response(data=StudyGroupSerializer(group, context=self.get_serializer_context()).data,
                                 status=status.HTTP_200_OK)
             else:
                 return Response(status=status.HTTP_404_NOT_FOUND)
@@ -284,17 +530,19 @@ class AddTeacher(APIView):
 
 
 class StudentList(APIView):
+    query_budget = 6
+
     def get(self, request, lesson_id):
         try:
             lesson = Lesson.objects.get(id=lesson_id)
             students = list()
-            for student in lesson.group.students.all():
-                item = SimpleUserSerializer(student).data
-                lesson.marks.filter(student_id=student.id).exists()
-                item |= {
-                    'attendance': True if lesson.attendances.filter(id=student.id).exists() else False,
-                    'mark': lesson.marks.filter(student_id=student.id).get().mark if
-                    lesson.marks.filter(student_id=student.id).exists() else None}
+            results = lesson.group.students.annotate(
+                attendance=Exists(Lesson.attendances.through.objects.filter(lesson_id=lesson.id,
+                                                                           user_id=OuterRef('pk'))),
+                mark=Subquery(Mark.objects.filter(lesson_id=lesson.id, student_id=OuterRef('pk')).values('mark')[:1]))
+            for student in results:
+                item = SimpleUserSerializer(student, context={'request': request}).data
+                item |= {'attendance': student.attendance, 'mark': student.mark}
                 students.append(item)
 
             return Response(data=students)
@@ -303,24 +551,118 @@ class StudentList(APIView):
 
 
 class StudentProgress(APIView):
+    query_budget = 8
+
     def get(self, request, group_id):
         try:
             email = request.GET.get('email', '')
             group = StudyGroup.objects.get(id=group_id)
             if group.students.filter(email=email).exists() \
-                    and group.teachers.filter(id=request.user.id).exists():
+                    and is_teacher(request, group.id):
                 studentId = group.students.get(email=email).id
                 data = list()
-                for lesson in group.lessons.all():
-                    item = StudentLessonSerializer(lesson).data
-                    item |= {'attendance': lesson.attendances.filter(id=studentId).exists()}
-                    try:
-                        item |= {'mark': lesson.marks.filter(student_id=studentId).get().mark}
-                    except Mark.DoesNotExist:
-                        item |= {'mark': None}
+                for lesson in with_student_results(group.lessons.all(), studentId):
+                    item = StudentLessonSerializer(lesson, context={'request': request}).data
+                    item |= {'attendance': lesson.attendance, 'mark': lesson.mark}
                     data.append(item)
                 return Response(data=data)
             else:
                 return Response(status=status.HTTP_403_FORBIDDEN)
         except Exception as e:
             return Response(status=status.HTTP_404_NOT_FOUND)
+
+
+class Batch(APIView):
+    query_budget = per_item(3, 12, key='responses')
+
+    def get_throttle_cost(self, request):
+        """
+        Write tokens taken up front, one per unsafe operation
+        """
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list):
+            return 1
+        return max(1, sum(1 for operation in operations
+                          if not isinstance(operation, dict)
+                          or str(operation.get('method', 'GET')).upper() not in permissions.SAFE_METHODS))
+
+    def post(self, request):
+        """
+        Executes {"operations": [{"method", "path", "body"}, ...]} in order in a single transaction,
+        "{{n.key}}" in path or body refers to the response body of operation n.
+        Stops at the first failed operation and rolls everything back.
+        """
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list) or not operations:
+            return Response(data={'operations': 'required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > settings.BATCH_MAX_OPERATIONS:
+            return Response(data={'operations': 'at most %d' % settings.BATCH_MAX_OPERATIONS},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        responses = list()
+        with transaction.atomic():
+            for operation in operations:
+                try:
+                    result = dispatch(request, operation, responses, membership_cache(request), Batch)
+                except BatchError as e:
+                    result = {'status': status.HTTP_400_BAD_REQUEST,
+                              'body': {'error': type(e).__name__, 'message': str(e)}}
+                responses.append(result)
+                if result['status'] >= 400:
+                    transaction.set_rollback(True)
+                    return Response(data={'committed': False, 'responses': responses},
+                                    status=status.HTTP_400_BAD_REQUEST)
+        return Response(data={'committed': True, 'responses': responses})
+
+
+class ProfileList(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    query_budget = 3
+
+    def get(self, request):
+        """
+        Latest request profiles captured by ProfilingMiddleware
+        """
+        profiles = RequestProfile.objects.defer('data')[:100]
+        return Response(data=RequestProfileSerializer(profiles, many=True, context={'request': request}).data)
+
+
+class ProfileDetail(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    query_budget = 3
+
+    def get(self, request, profile_id):
+        """
+        Profile info with the SQL log of the request
+        """
+        try:
+            profile = RequestProfile.objects.defer('data').get(id=profile_id)
+        except RequestProfile.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(data=dict(RequestProfileSerializer(profile, context={'request': request}).data) |
+                        {'queries': profile.queries})
+
+
+class ProfileDownload(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    query_budget = 3
+
+    def get(self, request, profile_id):
+        """
+        cProfile stats as .prof or sampled stacks as speedscope JSON, ?summary=1 gives a text report of .prof
+        """
+        try:
+            profile = RequestProfile.objects.get(id=profile_id)
+        except RequestProfile.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        data = bytes(profile.data)
+        if profile.mode == 'cprofile' and request.GET.get('summary'):
+            return HttpResponse(stats_summary(data), content_type='text/plain; charset=utf-8')
+        if profile.mode == 'cprofile':
+            response = HttpResponse(data, content_type='application/octet-stream')
+            filename = 'profile-%d.prof' % profile.id
+        else:
+            response = HttpResponse(data, content_type='application/json')
+            filename = 'profile-%d.speedscope.json' % profile.id
+        response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+        return response